@@ -0,0 +1,9 @@
+from django.urls import path
+
+from apps.auth       import urls
+from apps.auth.views import AsyncSigninView, AsyncUserView
+
+urlpatterns = [
+    path('/users/signin', AsyncSigninView.as_view()),
+    path('/users', AsyncUserView.as_view())
+] + urls.urlpatterns
@@ -1,7 +1,39 @@
-from django.db import models
+from django.db        import models
+from django.db.models import F
+from django.utils     import timezone
 
+from apps.util.caches import user_cache
 from apps.util.models import TimeStampModel
 
+class UserQuerySet(models.QuerySet):
+    def add_credit(self, user_id, amount):
+        '''
+        Applies a signed amount with one guarded UPDATE that writes only credit and updated_at.
+        Returns False, leaving the row untouched, when the credit would drop below zero.
+        '''
+        updated = self.filter(id=user_id, credit__gte=-amount).update(
+            credit     = F('credit') + amount,
+            updated_at = timezone.now()
+        )
+
+        user_cache.invalidate_on_commit(user_id)
+
+        return updated == 1
+
+    def replace_credit(self, user_id, old_credit, new_credit):
+        '''
+        Writes new_credit only if the row still holds old_credit.
+        Returns False when another writer got there first.
+        '''
+        updated = self.filter(id=user_id, credit=old_credit).update(
+            credit     = new_credit,
+            updated_at = timezone.now()
+        )
+
+        user_cache.invalidate_on_commit(user_id)
+
+        return updated == 1
+
 class User(TimeStampModel):
     first_name = models.CharField(max_length=5)
     last_name  = models.CharField(max_length=5)
@@ -9,6 +41,8 @@ class User(TimeStampModel):
     password   = models.BinaryField(max_length=60)
     credit     = models.PositiveIntegerField(default=0)
 
+    objects = UserQuerySet.as_manager()
+
     class Meta():
         db_table = 'users'
         
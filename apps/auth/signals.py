@@ -0,0 +1,9 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch          import receiver
+
+from apps.auth.models import User
+from apps.util.caches import user_cache
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate_on_commit(instance.id)
@@ -1,3 +1,182 @@
-from django.test import TestCase
+import os
+import runpy
+import threading
 
-# Create your tests here.
+import bcrypt
+import jwt
+
+from freezegun import freeze_time
+
+from django.conf import settings
+from django.test import TestCase, Client, override_settings
+
+from apps.auth.models     import User
+from apps.util.caches     import user_cache
+from apps.util.metrics    import registry, password_hash_queue_wait_seconds
+from apps.util.passwords  import password_hasher, hash_rounds
+from config.settings.base import SECRET_KEY
+
+client          = Client()
+access_token    = jwt.encode({'id':1}, SECRET_KEY)
+hashed_password = bcrypt.hashpw('1234'.encode('utf-8'), bcrypt.gensalt())
+
+@override_settings(USER_CACHE_ENABLED=True, USER_CACHE_MAX_SIZE=10, USER_CACHE_TTL=60)
+class UserCacheTest(TestCase):
+    def setUp(self):
+        user_cache.clear()
+
+        User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 50000
+            )
+
+    def tearDown(self):
+        User.objects.all().delete()
+        user_cache.clear()
+
+    def get_transactions(self, token=access_token):
+        return client.get('/accounts/1/transactions', HTTP_Authorization=token)
+
+    def test_cached_user_skips_user_query(self):
+        self.get_transactions()
+
+        with self.assertNumQueries(1):
+            response = self.get_transactions()
+
+        self.assertEqual(response.json(), {'message' : 'Invalid account id'})
+
+    def test_user_save_invalidates_cache(self):
+        self.get_transactions()
+
+        user = User.objects.get(id=1)
+        user.first_name = '병동'
+        user.save()
+
+        with self.assertNumQueries(2):
+            self.get_transactions()
+
+    def test_credit_update_invalidates_cache(self):
+        self.get_transactions()
+
+        User.objects.add_credit(1, 1000)
+
+        with self.assertNumQueries(2):
+            self.get_transactions()
+
+    def test_fill_racing_an_update_is_not_stored(self):
+        generation = user_cache.generation(1)
+        user       = User.objects.get(id=1)
+
+        User.objects.add_credit(1, 1000)
+        user_cache.set(access_token, 1, user, generation)
+
+        self.assertIsNone(user_cache.get(access_token, 1))
+
+        with self.assertNumQueries(2):
+            self.get_transactions()
+
+    def test_cached_user_expires_after_ttl(self):
+        with freeze_time('2022-10-30 00:00:00') as frozen_time:
+            self.get_transactions()
+
+            frozen_time.tick(61)
+
+            with self.assertNumQueries(2):
+                self.get_transactions()
+
+    @override_settings(USER_CACHE_MAX_SIZE=1)
+    def test_least_recently_used_user_is_evicted(self):
+        other_token = jwt.encode({'id':1, 'device':'other'}, SECRET_KEY)
+
+        self.get_transactions()
+        self.get_transactions(other_token)
+
+        with self.assertNumQueries(2):
+            self.get_transactions()
+
+@override_settings(PASSWORD_HASHER_WORKERS=1, PASSWORD_HASHER_QUEUE_SIZE=0)
+class PasswordHasherTest(TestCase):
+    def setUp(self):
+        password_hasher.reset()
+        registry.reset()
+
+        User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 50000
+            )
+
+    def tearDown(self):
+        User.objects.all().delete()
+        password_hasher.reset()
+        registry.reset()
+
+    def signin(self):
+        return client.post('/auth/users/signin', {'username': 'user1', 'password': '1234'}, content_type='application/json')
+
+    def test_signin_checks_password_on_the_pool(self):
+        response = self.signin()
+
+        [[_, [buckets, _]]] = password_hash_queue_wait_seconds.samples()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(buckets), 1)
+
+    @override_settings(BCRYPT_LOGIN_ROUNDS=4)
+    def test_signin_rehashes_at_configured_cost(self):
+        self.assertEqual(self.signin().status_code, 200)
+        self.assertEqual(hash_rounds(User.objects.get(username = 'user1').password), 4)
+        self.assertEqual(self.signin().status_code, 200)
+
+    def test_full_queue_fails_fast_with_503(self):
+        release = threading.Event()
+        busy    = password_hasher._PasswordHasher__submit(release.wait)
+
+        try:
+            response = self.signin()
+        finally:
+            release.set()
+            busy.result()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['message'], 'Password hashing is overloaded')
+        self.assertEqual(self.signin().status_code, 200)
+
+    def test_shipped_profile_sheds_before_every_thread_hashes(self):
+        environ = dict(os.environ)
+
+        for name in ('GUNICORN_WORKERS', 'GUNICORN_THREADS', 'PASSWORD_HASHER_WORKERS', 'PASSWORD_HASHER_QUEUE_SIZE'):
+            os.environ.pop(name, None)
+
+        try:
+            profile = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+
+        hasher_workers = profile['password_hasher_workers']
+        queue_size     = profile['password_hasher_queue_size']
+        release        = threading.Event()
+
+        self.assertLessEqual(profile['workers'] * hasher_workers, 2 * os.cpu_count() + 1)
+
+        with override_settings(PASSWORD_HASHER_WORKERS=hasher_workers, PASSWORD_HASHER_QUEUE_SIZE=queue_size):
+            password_hasher.reset()
+
+            # Every other thread of the worker is already hashing or waiting.
+            busy = [password_hasher._PasswordHasher__submit(release.wait) for _ in range(profile['threads'] - 1)]
+
+            try:
+                response = self.signin()
+            finally:
+                release.set()
+
+                for call in busy:
+                    call.result()
+
+        self.assertEqual(response.status_code, 503)
@@ -1,12 +1,15 @@
 import json
 
-import bcrypt
 import jwt
 
+from django.conf  import settings
 from django.views import View
 from django.http  import JsonResponse
 
 from .models              import User
+from apps.util.timing     import measure
+from apps.util.passwords  import password_hasher
+from apps.util.exceptions import ServiceUnavailableException
 from config.settings.base import SECRET_KEY
 
 class UserView(View):
@@ -16,7 +19,7 @@ class UserView(View):
             username, password = data.get('username'), data.get('password')
             first_name, last_name = data.get('first_name'), data.get('last_name')
 
-            hashed_password = bcrypt.hashpw(password.encode('utf-8'),bcrypt.gensalt())
+            hashed_password = password_hasher.hash(password, settings.BCRYPT_LOGIN_ROUNDS)
 
             User.objects.create(
                 username  = username,
@@ -26,6 +29,9 @@ class UserView(View):
             )
 
             return JsonResponse({'meesage' : 'Success'}, status=201)
+        except ServiceUnavailableException as e:
+            return JsonResponse({'message' : e.message}, status=e.status)
+
         except Exception:
             return JsonResponse({'message' : 'Server Error'}, status=500)
 
@@ -37,15 +43,77 @@ class SigninView(View):
 
             user = User.objects.get(username = username)
 
-            if not bcrypt.checkpw(password.encode('utf-8'), user.password):
+            is_valid_password, rehashed_password = password_hasher.verify(password, user.password, settings.BCRYPT_LOGIN_ROUNDS)
+
+            if not is_valid_password:
                 return JsonResponse({"message" : "Password Invalid"}, status=401)
 
-            access_token = jwt.encode({'id':user.id}, SECRET_KEY)
+            if rehashed_password:
+                User.objects.filter(id = user.id).update(password = rehashed_password)
+
+            with measure('jwt'):
+                access_token = jwt.encode({'id':user.id}, SECRET_KEY)
 
             return JsonResponse({'access_token' : access_token}, status=200)
 
         except User.DoesNotExist:
             return JsonResponse({'message' : 'User does not exist'}, status=400)
 
+        except ServiceUnavailableException as e:
+            return JsonResponse({'message' : e.message}, status=e.status)
+
         except Exception:
-            return JsonResponse({'message' : 'Server Error'}, status=500)
\ No newline at end of file
+            return JsonResponse({'message' : 'Server Error'}, status=500)
+
+class AsyncUserView(View):
+    async def post(self, request):
+        try:
+            data = json.loads(request.body)
+            username, password = data.get('username'), data.get('password')
+            first_name, last_name = data.get('first_name'), data.get('last_name')
+
+            hashed_password = await password_hasher.ahash(password, settings.BCRYPT_LOGIN_ROUNDS)
+
+            await User.objects.acreate(
+                username   = username,
+                password   = hashed_password,
+                first_name = first_name,
+                last_name  = last_name
+            )
+
+            return JsonResponse({'meesage' : 'Success'}, status=201)
+        except ServiceUnavailableException as e:
+            return JsonResponse({'message' : e.message}, status=e.status)
+
+        except Exception:
+            return JsonResponse({'message' : 'Server Error'}, status=500)
+
+class AsyncSigninView(View):
+    async def post(self, request):
+        try:
+            data = json.loads(request.body)
+            username, password = data.get('username'), data.get('password')
+
+            user = await User.objects.aget(username = username)
+
+            is_valid_password, rehashed_password = await password_hasher.averify(password, user.password, settings.BCRYPT_LOGIN_ROUNDS)
+
+            if not is_valid_password:
+                return JsonResponse({"message" : "Password Invalid"}, status=401)
+
+            if rehashed_password:
+                await User.objects.filter(id = user.id).aupdate(password = rehashed_password)
+
+            with measure('jwt'):
+                access_token = jwt.encode({'id':user.id}, SECRET_KEY)
+
+            return JsonResponse({'access_token' : access_token}, status=200)
+
+        except User.DoesNotExist:
+            return JsonResponse({'message' : 'User does not exist'}, status=400)
+
+        except ServiceUnavailableException as e:
+            return JsonResponse({'message' : e.message}, status=e.status)
+
+        except Exception:
+            return JsonResponse({'message' : 'Server Error'}, status=500)
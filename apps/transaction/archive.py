@@ -0,0 +1,69 @@
+import heapq
+
+from itertools import islice
+
+from apps.transaction.models import Transaction, ArchivedTransaction, Account
+from apps.util.sqlite        import write_transaction
+
+ARCHIVED_FIELDS = ['id', 'amount', 'balance', 'is_withdrawal', 'timestamp', 'summary', 'account_id']
+
+def archive_account(account_id, cutoff, batch_size):
+    '''
+    Moves the account's transactions older than cutoff into archived_transactions,
+    oldest first, batch_size rows per database transaction.
+    Each batch also raises Account.archived_before to the timestamp of its last row,
+    so readers know that no older row is left in transactions and no newer row is in the archive.
+    Returns the number of rows moved.
+    '''
+    moved = 0
+
+    while True:
+        count  = archive_batch(account_id, cutoff, batch_size)
+        moved += count
+
+        if count < batch_size:
+            return moved
+
+@write_transaction
+def archive_batch(account_id, cutoff, batch_size):
+    '''
+    Moves the account's oldest batch_size transactions before cutoff and returns how many were moved.
+    '''
+    rows = list(
+        Transaction.objects.filter(account_id = account_id, timestamp__lt = cutoff)
+        .order_by('timestamp', 'id').values_list(*ARCHIVED_FIELDS)[:batch_size]
+    )
+
+    if not rows:
+        return 0
+
+    ArchivedTransaction.objects.bulk_create([ArchivedTransaction(**dict(zip(ARCHIVED_FIELDS, row))) for row in rows])
+    Transaction.objects.filter(id__in = [row[0] for row in rows]).delete()
+    Account.objects.filter(id = account_id).update(archived_before = rows[-1][4])
+
+    return len(rows)
+
+def transaction_models(query, archived_before):
+    '''
+    Tables that can hold rows in the query's date range.
+    The archive only holds timestamps up to archived_before and transactions only from it on.
+    '''
+    models = []
+
+    if archived_before and query.start_date <= archived_before:
+        models.append(ArchivedTransaction)
+
+    if query.end_date >= archived_before:
+        models.append(Transaction)
+
+    return models
+
+def merge_rows(parts, is_descending, key, start=0, stop=None):
+    '''
+    Merges rows already sorted in page order, one list or iterator per table, and keeps [start:stop].
+    key gives the (timestamp, id) of a row.
+    '''
+    if len(parts) == 1:
+        return islice(parts[0], start, stop)
+
+    return islice(heapq.merge(*parts, key=key, reverse=is_descending), start, stop)
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from apps.transaction       import urls
+from apps.transaction.views import AsyncTransactionView, TransactionExportView
+
+# Django 4.1 iterates a StreamingHttpResponse synchronously on the event loop under ASGI, where the
+# export's chunked query raises SynchronousOnlyOperation mid-body, so the export is served by WSGI only.
+urlpatterns = [
+    path('/<int:account_id>/transactions', AsyncTransactionView.as_view())
+] + [pattern for pattern in urls.urlpatterns if getattr(pattern.callback, 'view_class', None) is not TransactionExportView]
@@ -0,0 +1,226 @@
+import random
+import itertools
+import multiprocessing
+
+from datetime import date, datetime, time
+
+from django.conf                  import settings
+from django.db                    import connections
+from django.db.models             import F, Max
+from django.db.models.functions   import Greatest
+from django.core.management.color import no_style
+
+from apps.auth.models        import User
+from apps.transaction.models import Account, AccountType, Transaction, ArchivedTransaction, DailyRollup
+from apps.util.passwords     import hash_password
+from apps.util.sqlite        import write_transaction
+from apps.util.transforms    import TimeTransform
+
+ONE_HOUR = 3600 * TimeTransform.ONE_SECOND
+ONE_DAY  = 24 * ONE_HOUR
+
+# Credit every user starts with, the largest value a PositiveIntegerField holds on every backend.
+# The money deposited into the user's accounts is taken out of it, as the ledger does.
+INITIAL_CREDIT = 2 ** 31 - 1
+
+# Cumulative share of transactions per hour of the day, busiest over business hours.
+HOUR_WEIGHTS = list(itertools.accumulate([1, 1, 1, 1, 1, 2, 4, 8, 12, 14, 14, 13, 15, 14, 13, 12, 12, 11, 10, 8, 6, 4, 3, 2]))
+SUMMARIES    = ['홍길동', '급여', '이체', '카드대금', '관리비', '통신비', '편의점', '현금인출', 'ATM입금', '이자']
+
+def window_start(until, days):
+    '''
+    Local midnight days days before until, as micro unix time. Transactions fall in [start, midnight of until).
+    '''
+    return int(datetime.combine(until, time.min).timestamp()) * TimeTransform.ONE_SECOND - days * ONE_DAY
+
+def generate_account(index, account_id, first_id, options):
+    '''
+    Builds the transactions of one account and the daily rollups that summarize them.
+    The random stream depends only on the seed and the account index, so the rows are the same
+    whatever the number of workers. Returns (transactions, rollups, closing balance).
+    '''
+    rng        = random.Random(f'{options["seed"]}:{index}')
+    start      = options['start']
+    timestamps = sorted(
+        start + rng.randrange(options['days']) * ONE_DAY
+              + rng.choices(range(24), cum_weights=HOUR_WEIGHTS)[0] * ONE_HOUR
+              + rng.randrange(ONE_HOUR)
+        for _ in range(options['transactions_per_account'])
+    )
+    balance      = 0
+    transactions = []
+    days         = {}
+
+    for offset, timestamp in enumerate(timestamps):
+        amount        = max(1, round(rng.lognormvariate(3.5, 1.2))) * 1000
+        is_withdrawal = balance >= amount and rng.random() < 0.45
+        day           = days.setdefault(date.fromtimestamp(timestamp // TimeTransform.ONE_SECOND), {
+            'deposit_amount'    : 0,
+            'deposit_count'     : 0,
+            'withdrawal_amount' : 0,
+            'withdrawal_count'  : 0,
+            'opening_balance'   : balance,
+        })
+        kind     = 'withdrawal' if is_withdrawal else 'deposit'
+        balance += -amount if is_withdrawal else amount
+
+        day[f'{kind}_amount'] += amount
+        day[f'{kind}_count']  += 1
+        day['closing_balance'] = balance
+
+        transactions.append(
+            Transaction(
+                id            = first_id + offset,
+                amount        = amount,
+                balance       = balance,
+                is_withdrawal = is_withdrawal,
+                timestamp     = timestamp,
+                summary       = rng.choice(SUMMARIES),
+                account_id    = account_id
+            )
+        )
+
+    rollups = [DailyRollup(account_id=account_id, date=day_date, **day) for day_date, day in days.items()]
+
+    return transactions, rollups, balance
+
+@write_transaction
+def write_chunk(transactions, rollups, balances, batch_size):
+    Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+    DailyRollup.objects.bulk_create(rollups, batch_size=batch_size)
+
+    for account_id, (balance, history_version) in balances.items():
+        Account.objects.filter(id = account_id).update(balance = balance, history_version = history_version)
+        User.objects.filter(account = account_id).update(credit = Greatest(F('credit') - balance, 0))
+
+def fill_accounts(task):
+    '''
+    Worker entry point: generates and writes the transactions of a slice of (index, account_id) pairs,
+    committing about chunk_size transactions at a time. Returns the number of transactions written.
+    '''
+    accounts, options = task
+    transactions      = []
+    rollups           = []
+    balances          = {}
+    written           = 0
+
+    for index, account_id in accounts:
+        first_id = options['first_id'] + index * options['transactions_per_account']
+        rows, days, balance = generate_account(index, account_id, first_id, options)
+
+        transactions += rows
+        rollups      += days
+        balances[account_id] = (balance, len(rows))
+
+        if len(transactions) >= options['chunk_size']:
+            write_chunk(transactions, rollups, balances, options['chunk_size'])
+            written += len(transactions)
+            transactions, rollups, balances = [], [], {}
+
+    if balances:
+        write_chunk(transactions, rollups, balances, options['chunk_size'])
+        written += len(transactions)
+
+    return written
+
+def create_owners(users, accounts_per_user, username_prefix, password, batch_size):
+    '''
+    Creates the users and their accounts and returns the (index, account_id) pairs of the new accounts,
+    where index numbers the accounts of this run from 0 in user then account order.
+    '''
+    login_password = hash_password(password, settings.BCRYPT_LOGIN_ROUNDS)
+    pin_password   = hash_password(password, settings.BCRYPT_PIN_ROUNDS)
+    account_type   = AccountType.objects.filter(name = '일반예금').first() or AccountType.objects.create(name = '일반예금')
+
+    created_users = User.objects.bulk_create([
+        User(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = f'{username_prefix}{i}',
+            password   = login_password,
+            credit     = INITIAL_CREDIT
+        ) for i in range(users)
+    ], batch_size=batch_size)
+
+    user_ids = created_ids(created_users, User.objects.filter(username__startswith = username_prefix).order_by('id'))
+
+    created_accounts = Account.objects.bulk_create([
+        Account(
+            account_number = f'{user_id:08d}{number:02d}'.encode('utf-8'),
+            password       = pin_password,
+            balance        = 0,
+            type_id        = account_type.id,
+            user_id        = user_id
+        ) for user_id in user_ids for number in range(accounts_per_user)
+    ], batch_size=batch_size)
+
+    account_ids = created_ids(created_accounts, Account.objects.filter(user_id__in = user_ids).order_by('user_id', 'id'))
+
+    return list(enumerate(account_ids))
+
+def created_ids(objects, queryset):
+    '''
+    Ids of rows made by bulk_create, read back from queryset on backends that do not return them.
+    '''
+    if objects and objects[0].id is None:
+        return list(queryset.values_list('id', flat=True))
+
+    return [row.id for row in objects]
+
+def first_transaction_id():
+    '''
+    One past the highest id in transactions and archived_transactions, so explicit ids never collide.
+    '''
+    live     = Transaction.objects.aggregate(last = Max('id'))['last'] or 0
+    archived = ArchivedTransaction.objects.aggregate(last = Max('id'))['last'] or 0
+
+    return max(live, archived) + 1
+
+def reset_sequences():
+    connection = connections['default']
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Transaction, DailyRollup]):
+            cursor.execute(sql)
+
+def generate(accounts, transactions_per_account, seed, until, days, workers, chunk_size, progress=None):
+    '''
+    Fills accounts, a list of (index, account_id) pairs, with transactions_per_account chained transactions
+    each, spread over the days days before until, plus their daily rollups and final balances.
+    Rows are written by workers forked processes, each committing its own chunks; with workers 1
+    everything runs in this process. Returns the number of transactions written.
+    '''
+    options = {
+        'seed'                     : seed,
+        'start'                    : window_start(until, days),
+        'days'                     : days,
+        'transactions_per_account' : transactions_per_account,
+        'chunk_size'               : chunk_size,
+        'first_id'                 : first_transaction_id(),
+    }
+    per_task = max(1, chunk_size // max(1, transactions_per_account))
+    tasks    = [(accounts[i:i + per_task], options) for i in range(0, len(accounts), per_task)]
+    written  = 0
+
+    if workers <= 1:
+        results = map(fill_accounts, tasks)
+    else:
+        connections.close_all()
+
+        pool    = multiprocessing.get_context('fork').Pool(workers)
+        results = pool.imap_unordered(fill_accounts, tasks)
+
+    try:
+        for count in results:
+            written += count
+
+            if progress:
+                progress(written)
+    finally:
+        if workers > 1:
+            pool.close()
+            pool.join()
+
+    reset_sequences()
+
+    return written
@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import functools
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db   import transaction, IntegrityError
+from django.http import HttpResponse, JsonResponse
+
+from apps.transaction.models import IdempotencyKey, time_now
+from apps.util.transforms    import TimeTransform
+from apps.util.exceptions    import BadRequestException, ConflictException
+
+def request_fingerprint(request):
+    digest = hashlib.sha256(request.method.encode('utf-8'))
+    digest.update(request.path.encode('utf-8'))
+    digest.update(request.body)
+
+    return digest.hexdigest()[:32]
+
+def replay(row):
+    response = HttpResponse(bytes(row.body), status=row.status, content_type='application/json')
+
+    if row.location:
+        response['Location'] = row.location
+
+    response['Idempotent-Replayed'] = 'true'
+
+    return response
+
+def transaction_response(transaction_row):
+    '''
+    201 response to a deposit or withdrawal, built the same way for the view and for the stored copy.
+    '''
+    result  = {'Balance after transaction': transaction_row.balance, 'Transaction amount': transaction_row.amount}
+    headers = {'Location': f'/transactions/{transaction_row.id}'}
+
+    return JsonResponse(result, headers = headers, status=201)
+
+def claim(user_id, key, fingerprint):
+    '''
+    Inserts a pending row for (user_id, key) and returns (row, True), or returns (existing row, False).
+    A pending row only holds the key for IDEMPOTENCY_CLAIM_TIMEOUT seconds, so a key whose worker died
+    before its write committed can be used again. An expired row is dropped and the key claimed again.
+    '''
+    now = time_now()
+
+    while True:
+        try:
+            with transaction.atomic(using='default'):
+                row = IdempotencyKey.objects.create(
+                    user_id     = user_id,
+                    key         = key,
+                    fingerprint = fingerprint,
+                    expires_at  = now + settings.IDEMPOTENCY_CLAIM_TIMEOUT * TimeTransform.ONE_SECOND
+                )
+
+            return row, True
+
+        except IntegrityError:
+            row = IdempotencyKey.objects.filter(user_id = user_id, key = key).first()
+
+            if row is None:
+                continue
+
+            if row.expires_at > now:
+                return row, False
+
+            IdempotencyKey.objects.filter(id = row.id, expires_at = row.expires_at).delete()
+
+def lock_claims(claims):
+    '''
+    Locks the pending rows of claims and returns the ids of those still held.
+    Call it inside the write transaction that will store their responses.
+    '''
+    ids = [claim.id for claim in claims if claim is not None]
+
+    if not ids:
+        return set()
+
+    return set(IdempotencyKey.objects.select_for_update().filter(id__in = ids, status = 0).values_list('id', flat=True))
+
+def store_response(claim, transaction_row):
+    '''
+    Stores the response to the claimed request, keeping it for IDEMPOTENCY_KEY_TTL seconds.
+    Call it in the write transaction of transaction_row, so the row and the stored response commit together.
+    '''
+    response = transaction_response(transaction_row)
+
+    IdempotencyKey.objects.filter(id = claim.id, status = 0).update(
+        status     = response.status_code,
+        body       = response.content,
+        location   = response['Location'],
+        expires_at = time_now() + settings.IDEMPOTENCY_KEY_TTL * TimeTransform.ONE_SECOND
+    )
+
+def existing_response(row, fingerprint):
+    if row.fingerprint != fingerprint:
+        raise BadRequestException('Idempotency key reused for a different request')
+
+    if not row.status:
+        raise ConflictException('Request with this idempotency key is in progress')
+
+    return replay(row)
+
+def release(claim):
+    '''
+    Drops the claim if the view did not store a response with its write,
+    since then nothing was written and a retry should run again.
+    '''
+    IdempotencyKey.objects.filter(id = claim.id, status = 0).delete()
+
+def idempotency_key(request):
+    key = request.headers.get('Idempotency-Key')
+
+    if key is not None and not 0 < len(key) <= 64:
+        raise BadRequestException('Invalid idempotency key')
+
+    return key
+
+def idempotent(func):
+    '''
+    Makes a POST view, sync or async, replay its first successful response to retries sent
+    with the same Idempotency-Key header by the same user, without running the view again.
+    A retry that arrives while the first request is still running gets 409.
+    The claimed row is set on request.idempotency_claim (None without the header); the view hands it
+    to the ledger, which stores the response in the same database transaction as the write.
+    Requests without the header run as usual. Apply it under validate_token so request.user is known.
+    '''
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(self, request, *args, **kwargs):
+            request.idempotency_claim = None
+            key                       = idempotency_key(request)
+
+            if key is None:
+                return await func(self, request, *args, **kwargs)
+
+            fingerprint = request_fingerprint(request)
+            row, is_new = await sync_to_async(claim)(request.user.id, key, fingerprint)
+
+            if not is_new:
+                return existing_response(row, fingerprint)
+
+            request.idempotency_claim = row
+
+            try:
+                return await func(self, request, *args, **kwargs)
+            finally:
+                await sync_to_async(release)(row)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(self, request, *args, **kwargs):
+        request.idempotency_claim = None
+        key                       = idempotency_key(request)
+
+        if key is None:
+            return func(self, request, *args, **kwargs)
+
+        fingerprint = request_fingerprint(request)
+        row, is_new = claim(request.user.id, key, fingerprint)
+
+        if not is_new:
+            return existing_response(row, fingerprint)
+
+        request.idempotency_claim = row
+
+        try:
+            return func(self, request, *args, **kwargs)
+        finally:
+            release(row)
+
+    return wrapper
+
+def purge_expired(batch_size):
+    '''
+    Deletes expired keys batch_size rows per statement and returns how many were deleted.
+    '''
+    now     = time_now()
+    deleted = 0
+
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte = now).values_list('id', flat=True)[:batch_size])
+
+        if not ids:
+            return deleted
+
+        deleted += IdempotencyKey.objects.filter(id__in = ids).delete()[0]
@@ -0,0 +1,231 @@
+import time
+import threading
+
+from django.conf      import settings
+from django.db.models import F
+from django.utils     import timezone
+
+from apps.transaction.models      import Transaction, Account, DailyRollup
+from apps.transaction.idempotency import lock_claims, store_response
+from apps.auth.models             import User
+from apps.util.exceptions         import BadRequestException, ConflictException
+from apps.util.metrics            import transaction_rejections_total
+from apps.util.sqlite             import write_transaction
+
+class LedgerEntry:
+    '''
+    One deposit or withdrawal. claim is the request's pending IdempotencyKey row, if any;
+    its response is stored in the same database transaction as the entry's Transaction row.
+    '''
+    def __init__(self, account_id, amount, is_withdrawal, summary, claim=None):
+        self.account_id    = account_id
+        self.amount        = amount
+        self.is_withdrawal = is_withdrawal
+        self.summary       = summary
+        self.claim         = claim
+        self.signed_amount = -amount if is_withdrawal else amount
+
+        self.transaction_row = None
+        self.error           = None
+        self.done            = threading.Event()
+
+class ConcurrentUpdateException(Exception):
+    pass
+
+CLAIM_EXPIRED = 'Idempotency key expired before the request finished'
+
+REJECTION_REASONS = {
+    'Insufficient balance'    : 'insufficient_balance',
+    'Dont have enough credit' : 'insufficient_credit',
+    CLAIM_EXPIRED             : 'idempotency_claim_expired',
+}
+
+def post_entry(user_id, entry):
+    '''
+    Writes one deposit or withdrawal for the account owned by user_id and returns its Transaction row.
+    Goes through the group commit queue when TRANSACTION_GROUP_COMMIT is on.
+    '''
+    if settings.TRANSACTION_GROUP_COMMIT:
+        return group_commit_queue.submit(entry)
+
+    return _post_entry(user_id, entry)
+
+@write_transaction
+def _post_entry(user_id, entry):
+    if entry.claim and entry.claim.id not in lock_claims([entry.claim]):
+        transaction_rejections_total.inc(reason = REJECTION_REASONS[CLAIM_EXPIRED])
+        raise ConflictException(CLAIM_EXPIRED)
+
+    if not Account.objects.add_balance(entry.account_id, entry.signed_amount):
+        transaction_rejections_total.inc(reason = 'insufficient_balance')
+        raise BadRequestException('Insufficient balance')
+
+    if not User.objects.add_credit(user_id, -entry.signed_amount):
+        transaction_rejections_total.inc(reason = 'insufficient_credit')
+        raise BadRequestException('Dont have enough credit')
+
+    balance = Account.objects.filter(id = entry.account_id).values_list('balance', flat=True).get()
+
+    transaction_row = Transaction.objects.create(
+        amount        = entry.amount,
+        balance       = balance,
+        is_withdrawal = entry.is_withdrawal,
+        summary       = entry.summary,
+        account_id    = entry.account_id
+    )
+
+    DailyRollup.objects.record(entry.account_id, [transaction_row])
+
+    if entry.claim:
+        store_response(entry.claim, transaction_row)
+
+    return transaction_row
+
+def commit_entries(account_id, entries, retries=3):
+    '''
+    Applies entries for one account in a single database transaction.
+    Balances are chained in order, the Transaction rows are written with one bulk_create,
+    and Account and User are written once each.
+    An entry that would overdraw the balance or the owner's credit fails alone.
+    '''
+    for attempt in range(retries):
+        try:
+            rows = _commit_entries(account_id, entries)
+            break
+        except ConcurrentUpdateException:
+            if attempt == retries - 1:
+                raise
+
+    for entry in entries:
+        if entry.error:
+            transaction_rejections_total.inc(reason = REJECTION_REASONS.get(entry.error.message, 'other'))
+
+    return rows
+
+@write_transaction
+def _commit_entries(account_id, entries):
+    account = Account.objects.select_for_update().only('balance', 'user_id').get(id = account_id)
+    credit  = User.objects.select_for_update().values_list('credit', flat=True).get(id = account.user_id)
+
+    claims  = lock_claims([entry.claim for entry in entries])
+
+    balance, rows, start_credit = account.balance, [], credit
+
+    for entry in entries:
+        entry.error = None
+
+        if entry.claim and entry.claim.id not in claims:
+            entry.error = ConflictException(CLAIM_EXPIRED)
+            continue
+
+        if balance + entry.signed_amount < 0:
+            entry.error = BadRequestException('Insufficient balance')
+            continue
+
+        if credit - entry.signed_amount < 0:
+            entry.error = BadRequestException('Dont have enough credit')
+            continue
+
+        balance += entry.signed_amount
+        credit  -= entry.signed_amount
+
+        rows.append(
+            Transaction(
+                amount        = entry.amount,
+                balance       = balance,
+                is_withdrawal = entry.is_withdrawal,
+                summary       = entry.summary,
+                account_id    = account_id
+            )
+        )
+
+    if not rows:
+        return []
+
+    now = timezone.now()
+
+    updated = Account.objects.filter(id = account_id, balance = account.balance).update(
+        balance         = balance,
+        history_version = F('history_version') + 1,
+        updated_at      = now
+    )
+
+    if not updated:
+        raise ConcurrentUpdateException()
+
+    if not User.objects.replace_credit(account.user_id, start_credit, credit):
+        raise ConcurrentUpdateException()
+
+    Transaction.objects.bulk_create(rows)
+    DailyRollup.objects.record(account_id, rows)
+
+    for entry, row in zip([entry for entry in entries if not entry.error], rows):
+        entry.transaction_row = row
+
+        if entry.claim:
+            store_response(entry.claim, row)
+
+    return rows
+
+@write_transaction
+def commit_batch(entries):
+    '''
+    Applies commit_entries for every account of a batch in one database transaction.
+    entries maps account ids to their entries in request order; the first failing entry rolls back the whole batch.
+    '''
+    for account_index, (account_id, account_entries) in enumerate(entries.items()):
+        commit_entries(account_id, account_entries)
+
+        for index, entry in enumerate(account_entries):
+            if entry.error:
+                raise BadRequestException(f'{entry.error} at accounts[{account_index}].transactions[{index}]')
+
+class GroupCommitQueue:
+    '''
+    Coalesces concurrent writes to the same account.
+    Requests queue their entry by account; whichever request takes the account's commit
+    lock first commits everything queued so far in one transaction, and the others
+    pick up their own result once it is released.
+    '''
+    STRIPES = 64
+
+    def __init__(self, commit=commit_entries):
+        self.__commit  = commit
+        self.__lock    = threading.Lock()
+        self.__pending = {}
+        self.__stripes = [threading.Lock() for _ in range(self.STRIPES)]
+
+    def submit(self, entry):
+        with self.__lock:
+            self.__pending.setdefault(entry.account_id, []).append(entry)
+
+        with self.__stripes[entry.account_id % self.STRIPES]:
+            if not entry.done.is_set():
+                self.__commit_pending(entry.account_id)
+
+        if entry.error:
+            raise entry.error
+
+        return entry.transaction_row
+
+    def __commit_pending(self, account_id):
+        linger = settings.TRANSACTION_GROUP_COMMIT_LINGER
+
+        if linger:
+            time.sleep(linger)
+
+        with self.__lock:
+            batch = self.__pending.pop(account_id, [])
+
+        try:
+            self.__commit(account_id, batch)
+
+        except Exception as e:
+            for entry in batch:
+                entry.error = e
+
+        finally:
+            for entry in batch:
+                entry.done.set()
+
+group_commit_queue = GroupCommitQueue()
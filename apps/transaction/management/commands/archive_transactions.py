@@ -0,0 +1,31 @@
+from django.conf                 import settings
+from django.core.management.base import BaseCommand
+
+from apps.transaction.models  import Account, time_now
+from apps.transaction.archive import archive_account
+from apps.util.transforms     import TimeTransform
+
+class Command(BaseCommand):
+    help = 'Moves transactions older than the given age from transactions to archived_transactions in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.TRANSACTION_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=settings.TRANSACTION_ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--account', type=int, action='append', dest='account_ids', help='archive only these accounts')
+
+    def handle(self, *args, **options):
+        cutoff      = time_now() - options['older_than_days'] * 86400 * TimeTransform.ONE_SECOND
+        account_ids = options['account_ids'] or list(Account.objects.order_by('id').values_list('id', flat=True))
+        moved       = 0
+        accounts    = 0
+
+        for account_id in account_ids:
+            count = archive_account(account_id, cutoff, options['batch_size'])
+
+            if count:
+                moved    += count
+                accounts += 1
+
+                self.stdout.write(f'account {account_id}: {count} transactions archived')
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} transactions from {accounts} accounts'))
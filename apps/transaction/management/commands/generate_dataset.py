@@ -0,0 +1,54 @@
+import os
+import time
+
+from datetime import date
+
+from django.core.management      import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.transaction.dataset import create_owners, generate
+
+class Command(BaseCommand):
+    help = 'Creates users, accounts and chained transaction histories with daily rollups for load tests and benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--accounts-per-user', type=int, default=1)
+        parser.add_argument('--transactions-per-account', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0, help='same seed and --until give the same rows')
+        parser.add_argument('--days', type=int, default=365, help='transactions are spread over this many days before --until')
+        parser.add_argument('--until', type=date.fromisoformat, default=date.today(), help='YYYY-MM-DD, defaults to today')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='processes generating and writing rows')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='transactions per bulk_create and commit')
+        parser.add_argument('--username-prefix', default='user')
+        parser.add_argument('--password', default='1234', help='login password and account PIN of every user')
+        parser.add_argument('--flush', action='store_true', help='empty the database first')
+
+    def handle(self, *args, **options):
+        if len(f'{options["username_prefix"]}{options["users"] - 1}') > 10:
+            raise CommandError('Usernames would be longer than 10 characters, use a shorter --username-prefix')
+
+        if options['flush']:
+            call_command('flush', interactive=False, verbosity=0)
+
+        started  = time.perf_counter()
+        accounts = create_owners(
+            options['users'], options['accounts_per_user'], options['username_prefix'], options['password'], options['chunk_size']
+        )
+
+        self.stdout.write(f'{options["users"]} users and {len(accounts)} accounts created')
+
+        total   = len(accounts) * options['transactions_per_account']
+        written = generate(
+            accounts,
+            options['transactions_per_account'],
+            options['seed'],
+            options['until'],
+            options['days'],
+            options['workers'],
+            options['chunk_size'],
+            progress = lambda written: self.stdout.write(f'{written}/{total} transactions written') if options['verbosity'] > 1 else None
+        )
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} transactions in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.0f} rows/s)'))
@@ -0,0 +1,15 @@
+from django.conf                 import settings
+from django.core.management.base import BaseCommand
+
+from apps.transaction.idempotency import purge_expired
+
+class Command(BaseCommand):
+    help = 'Deletes expired idempotency keys in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.IDEMPOTENCY_PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
@@ -0,0 +1,71 @@
+# Generated by Django 4.1.3 on 2026-10-19 02:59
+
+from datetime import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_daily_rollups(apps, schema_editor):
+    Transaction = apps.get_model('transaction', 'Transaction')
+    DailyRollup = apps.get_model('transaction', 'DailyRollup')
+
+    rollups = {}
+    rows    = Transaction.objects.order_by('account_id', 'timestamp', 'id').values_list(
+        'account_id', 'timestamp', 'amount', 'balance', 'is_withdrawal'
+    )
+
+    for account_id, timestamp, amount, balance, is_withdrawal in rows.iterator(chunk_size=10000):
+        key = (account_id, datetime.fromtimestamp(timestamp).date())
+
+        if key not in rollups:
+            rollups[key] = DailyRollup(
+                account_id      = account_id,
+                date            = key[1],
+                opening_balance = balance + amount if is_withdrawal else balance - amount,
+            )
+
+        rollup = rollups[key]
+
+        if is_withdrawal:
+            rollup.withdrawal_amount += amount
+            rollup.withdrawal_count  += 1
+        else:
+            rollup.deposit_amount += amount
+            rollup.deposit_count  += 1
+
+        rollup.closing_balance = balance
+
+    DailyRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0008_remove_transaction_timestamp_not_more_than_now_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('deposit_amount', models.DecimalField(decimal_places=4, default=0, max_digits=19)),
+                ('deposit_count', models.PositiveIntegerField(default=0)),
+                ('withdrawal_amount', models.DecimalField(decimal_places=4, default=0, max_digits=19)),
+                ('withdrawal_count', models.PositiveIntegerField(default=0)),
+                ('opening_balance', models.DecimalField(decimal_places=4, max_digits=19)),
+                ('closing_balance', models.DecimalField(decimal_places=4, max_digits=19)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='transaction.account')),
+            ],
+            options={
+                'db_table': 'daily_rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('account', 'date'), name='daily_rollups_account_date_unique'),
+        ),
+        migrations.RunPython(backfill_daily_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.3 on 2026-10-19 06:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0009_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='timestamp_us',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.1.3 on 2026-10-19 06:12
+
+from django.db import migrations, models, transaction
+from django.db.models.functions import Cast, Round
+
+CHUNK_SIZE = 10000
+
+
+def update_in_chunks(apps, schema_editor, **values):
+    '''
+    Updates the transactions one id range at a time, committing after each chunk
+    so writers are never blocked for the whole table.
+    '''
+    Transaction = apps.get_model('transaction', 'Transaction')
+    database    = schema_editor.connection.alias
+    rows        = Transaction.objects.using(database)
+    last_id     = rows.order_by('-id').values_list('id', flat=True).first() or 0
+
+    for start in range(0, last_id + 1, CHUNK_SIZE):
+        with transaction.atomic(using=database):
+            rows.filter(id__gte=start, id__lt=start + CHUNK_SIZE).update(**values)
+
+
+def backfill_timestamp_us(apps, schema_editor):
+    update_in_chunks(
+        apps, schema_editor, timestamp_us=Cast(Round(models.F('timestamp') * 1000000), models.BigIntegerField())
+    )
+
+
+def restore_timestamp(apps, schema_editor):
+    update_in_chunks(
+        apps, schema_editor, timestamp=Cast(models.F('timestamp_us'), models.FloatField()) / 1000000
+    )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('transaction', '0010_transaction_timestamp_us'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_timestamp_us, restore_timestamp),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.1.3 on 2026-10-19 06:12
+
+import apps.transaction.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0011_backfill_transaction_timestamp_us'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='transaction',
+            name='timestamp_not_lower_zero',
+        ),
+        migrations.AlterIndexTogether(
+            name='transaction',
+            index_together=set(),
+        ),
+        migrations.RemoveField(
+            model_name='transaction',
+            name='timestamp',
+        ),
+        migrations.RenameField(
+            model_name='transaction',
+            old_name='timestamp_us',
+            new_name='timestamp',
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='timestamp',
+            field=models.PositiveBigIntegerField(default=apps.transaction.models.time_now),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.CheckConstraint(check=models.Q(('timestamp__gte', 0)), name='timestamp_not_lower_zero'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'timestamp', 'id'], name='transactions_account_ts_id'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'is_withdrawal', 'timestamp', 'id'], name='transactions_acct_type_ts_id'),
+        ),
+    ]
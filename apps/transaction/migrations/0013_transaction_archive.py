@@ -0,0 +1,43 @@
+# Generated by Django 4.1.3 on 2026-10-19 03:15
+
+import apps.transaction.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0012_transaction_timestamp_microseconds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='archived_before',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('amount', models.DecimalField(decimal_places=4, max_digits=19)),
+                ('balance', models.DecimalField(decimal_places=4, max_digits=19)),
+                ('is_withdrawal', models.BooleanField()),
+                ('timestamp', models.PositiveBigIntegerField(default=apps.transaction.models.time_now)),
+                ('summary', models.CharField(max_length=20)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='transaction.account')),
+            ],
+            options={
+                'db_table': 'archived_transactions',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['account', 'timestamp', 'id'], name='archived_tx_account_ts_id'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['account', 'is_withdrawal', 'timestamp', 'id'], name='archived_tx_acct_type_ts_id'),
+        ),
+    ]
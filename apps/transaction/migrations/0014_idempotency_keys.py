@@ -0,0 +1,39 @@
+# Generated by Django 4.1.3 on 2026-10-19 03:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0006_user_credit'),
+        ('transaction', '0013_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('fingerprint', models.CharField(max_length=32)),
+                ('status', models.PositiveSmallIntegerField(default=0)),
+                ('body', models.BinaryField(default=b'')),
+                ('location', models.CharField(default='', max_length=64)),
+                ('expires_at', models.PositiveBigIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth.user')),
+            ],
+            options={
+                'db_table': 'idempotency_keys',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='idempotencykey',
+            index=models.Index(fields=['expires_at'], name='idempotency_keys_expires_at'),
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencykey',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='idempotency_keys_user_key_unique'),
+        ),
+    ]
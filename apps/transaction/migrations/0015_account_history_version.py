@@ -0,0 +1,18 @@
+# Generated by Django 4.1.3 on 2026-10-19 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0014_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='history_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
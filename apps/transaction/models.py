@@ -1,20 +1,39 @@
-from django.db    import models
-from django.utils import timezone
+from django.db        import models, transaction, IntegrityError
+from django.db.models import F
+from django.utils     import timezone
 
 from apps.util.models     import TimeStampModel
 from apps.util.transforms import TimeTransform
 
 # Create your models here.
 def time_now():
-    now = TimeTransform().get_now()
+    now = TimeTransform().get_now('int_unix_time')
     return now
 
+class AccountQuerySet(models.QuerySet):
+    def add_balance(self, account_id, amount):
+        '''
+        Applies a signed amount with one guarded UPDATE that writes only balance, history_version and updated_at.
+        Returns False, leaving the row untouched, when the balance would drop below zero.
+        '''
+        updated = self.filter(id=account_id, balance__gte=-amount).update(
+            balance         = F('balance') + amount,
+            history_version = F('history_version') + 1,
+            updated_at      = timezone.now()
+        )
+
+        return updated == 1
+
 class Account(TimeStampModel):
-    account_number = models.BinaryField(max_length=256)
-    balance        = models.DecimalField(max_digits=19, decimal_places=4, default=0)
-    password       = models.BinaryField(max_length=60)
-    user           = models.ForeignKey('auth.User', on_delete=models.PROTECT)
-    type           = models.ForeignKey('AccountType', on_delete=models.PROTECT)
+    account_number  = models.BinaryField(max_length=256)
+    balance         = models.DecimalField(max_digits=19, decimal_places=4, default=0)
+    password        = models.BinaryField(max_length=60)
+    user            = models.ForeignKey('auth.User', on_delete=models.PROTECT)
+    type            = models.ForeignKey('AccountType', on_delete=models.PROTECT)
+    archived_before = models.PositiveBigIntegerField(default=0)
+    history_version = models.PositiveBigIntegerField(default=0)
+
+    objects = AccountQuerySet.as_manager()
 
     class Meta():
         db_table = 'accounts'
@@ -29,19 +48,126 @@ class AccountType(models.Model):
     class Meta():
         db_table = 'account_types'
 
-class Transaction(models.Model):
+class AbstractTransaction(models.Model):
     amount        = models.DecimalField(max_digits=19, decimal_places=4)
     balance       = models.DecimalField(max_digits=19, decimal_places=4)
     is_withdrawal = models.BooleanField()
-    timestamp     = models.FloatField(default=time_now)
+    timestamp     = models.PositiveBigIntegerField(default=time_now)
     summary       = models.CharField(max_length=20)
     account       = models.ForeignKey('Account', on_delete=models.PROTECT)
 
+    class Meta():
+        abstract = True
+
+class Transaction(AbstractTransaction):
     class Meta():
         db_table = 'transactions'
-        index_together = ['account', 'timestamp']
+        indexes  = [
+            models.Index(name='transactions_account_ts_id', fields=['account', 'timestamp', 'id']),
+            models.Index(name='transactions_acct_type_ts_id', fields=['account', 'is_withdrawal', 'timestamp', 'id']),
+        ]
         constraints= [
             models.CheckConstraint(name='tansactions_amount_not_less_than_zero', check=models.Q(amount__gte=0)),
             models.CheckConstraint(name='tansactions_balance_not_less_than_zero', check=models.Q(balance__gte=0)),
             models.CheckConstraint(name='timestamp_not_lower_zero', check= models.Q(timestamp__gte = 0))
-            ]
\ No newline at end of file
+            ]
+
+class ArchivedTransaction(AbstractTransaction):
+    '''
+    Cold copy of transactions moved out of the transactions table by the archive_transactions command.
+    Rows keep the id they had in transactions, so (timestamp, id) order is the same in both tables.
+    '''
+    id = models.BigIntegerField(primary_key=True)
+
+    class Meta():
+        db_table = 'archived_transactions'
+        indexes  = [
+            models.Index(name='archived_tx_account_ts_id', fields=['account', 'timestamp', 'id']),
+            models.Index(name='archived_tx_acct_type_ts_id', fields=['account', 'is_withdrawal', 'timestamp', 'id']),
+        ]
+
+class DailyRollupQuerySet(models.QuerySet):
+    def record(self, account_id, transaction_rows):
+        '''
+        Folds new transaction rows, in balance order, into the account's daily rollups.
+        Call it inside the atomic block that wrote the rows.
+        '''
+        days = {}
+
+        for row in transaction_rows:
+            date = TimeTransform(row.timestamp, 'micro_unix_time').make_aware().date()
+            day  = days.setdefault(date, {
+                'deposit_amount'    : 0,
+                'deposit_count'     : 0,
+                'withdrawal_amount' : 0,
+                'withdrawal_count'  : 0,
+                'opening_balance'   : row.balance + row.amount if row.is_withdrawal else row.balance - row.amount,
+            })
+
+            kind = 'withdrawal' if row.is_withdrawal else 'deposit'
+
+            day[f'{kind}_amount'] += row.amount
+            day[f'{kind}_count']  += 1
+            day['closing_balance'] = row.balance
+
+        for date, day in days.items():
+            self.__add_day(account_id, date, day)
+
+    def __add_day(self, account_id, date, day):
+        updated = self.filter(account_id=account_id, date=date).update(
+            deposit_amount    = F('deposit_amount') + day['deposit_amount'],
+            deposit_count     = F('deposit_count') + day['deposit_count'],
+            withdrawal_amount = F('withdrawal_amount') + day['withdrawal_amount'],
+            withdrawal_count  = F('withdrawal_count') + day['withdrawal_count'],
+            closing_balance   = day['closing_balance']
+        )
+
+        if updated:
+            return
+
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(account_id=account_id, date=date, **day)
+        except IntegrityError:
+            self.__add_day(account_id, date, day)
+
+class DailyRollup(models.Model):
+    account           = models.ForeignKey('Account', on_delete=models.CASCADE)
+    date              = models.DateField()
+    deposit_amount    = models.DecimalField(max_digits=19, decimal_places=4, default=0)
+    deposit_count     = models.PositiveIntegerField(default=0)
+    withdrawal_amount = models.DecimalField(max_digits=19, decimal_places=4, default=0)
+    withdrawal_count  = models.PositiveIntegerField(default=0)
+    opening_balance   = models.DecimalField(max_digits=19, decimal_places=4)
+    closing_balance   = models.DecimalField(max_digits=19, decimal_places=4)
+
+    objects = DailyRollupQuerySet.as_manager()
+
+    class Meta():
+        db_table = 'daily_rollups'
+        constraints = [
+            models.UniqueConstraint(name='daily_rollups_account_date_unique', fields=['account', 'date']),
+        ]
+class IdempotencyKey(models.Model):
+    '''
+    First response to a transaction POST sent with an Idempotency-Key header, replayed to retries
+    of the same key until expires_at. status 0 marks a request that is still being served; such a row
+    expires after IDEMPOTENCY_CLAIM_TIMEOUT, and the response is stored with the transaction it describes.
+    fingerprint is a hash of the request, so a key cannot be reused for a different one.
+    '''
+    user        = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    key         = models.CharField(max_length=64)
+    fingerprint = models.CharField(max_length=32)
+    status      = models.PositiveSmallIntegerField(default=0)
+    body        = models.BinaryField(default=b'')
+    location    = models.CharField(max_length=64, default='')
+    expires_at  = models.PositiveBigIntegerField()
+
+    class Meta():
+        db_table    = 'idempotency_keys'
+        indexes     = [
+            models.Index(name='idempotency_keys_expires_at', fields=['expires_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(name='idempotency_keys_user_key_unique', fields=['user', 'key']),
+        ]
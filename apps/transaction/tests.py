@@ -1,15 +1,49 @@
+import io
+import os
+import asyncio
+import json
+import time
+import datetime
+import tempfile
+import threading
+
 import bcrypt
 import jwt
 
 from decimal   import *
 from freezegun import freeze_time
 
-from django.test  import TestCase, Client
-from django.utils import timezone
-
-from apps.transaction.models import Transaction, Account, AccountType
-from apps.auth.models        import User
-from config.settings.base    import SECRET_KEY
+from django.conf                 import settings
+from django.db                   import connection, connections, transaction, close_old_connections, OperationalError
+from django.core.management      import call_command, CommandError
+from django.core.management.base import SystemCheckError
+from django.test                 import TestCase, TransactionTestCase, Client, AsyncClient, override_settings
+from django.test.utils           import CaptureQueriesContext
+from django.http                 import JsonResponse, QueryDict
+from django.utils                import timezone
+from django.core.cache           import cache, caches
+from django.core.handlers.asgi   import ASGIHandler
+from django.core.signals         import request_started, request_finished
+
+from apps.transaction.models      import Transaction, Account, AccountType, DailyRollup, ArchivedTransaction, IdempotencyKey, time_now
+from apps.transaction.ledger      import LedgerEntry, GroupCommitQueue, commit_entries, post_entry
+from apps.transaction.idempotency import claim
+from apps.transaction.views       import filter_transactions
+from apps.transaction.archive     import archive_account
+from apps.transaction.dataset     import INITIAL_CREDIT
+from apps.auth.models             import User
+from apps.util.checks             import check_read_your_writes_cache
+from apps.util.exceptions         import BadRequestException, ConflictException
+from apps.util.middlewares        import InstrumentationMiddleware
+from apps.util.metrics            import registry, database_lock_retries_total, database_lock_failures_total
+from apps.util.serializers        import TransactionPageSerializer
+from apps.util.passwords          import hash_rounds
+from apps.util.routers            import read_database, aread_database
+from apps.util.sqlite             import write_transaction
+from apps.util.warmup             import warm_up
+from apps.util.transforms         import TimeTransform, CursorTransform, GetTransactionsQueryTransform
+from config.settings.base         import SECRET_KEY
+from config.settings              import asgi as asgi_settings
 
 client          = Client()
 balance         = Decimal('100000.0000')
@@ -309,6 +343,119 @@ class TransactionViewTest(TestCase):
         self.assertEqual(response.json(), expected_response)
         self.assertEqual(response.status_code, 400)
 
+    def test_withdrawal_fail_case_insufficient_balance(self):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : '100001',
+            'is_withdrawal' : True
+        }
+
+        headers = {
+            'HTTP_Authorization' : access_token,
+            'content_type'       :'application/json'
+        }
+
+        response = client.post('/accounts/1/transactions', request_body, **headers)
+
+        expected_response = {'message' : 'Insufficient balance'}
+
+        self.assertEqual(response.json(), expected_response)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Account.objects.get(id=1).balance, balance)
+        self.assertEqual(User.objects.get(id=1).credit, 50000)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_deposit_success_case_updates_only_changed_columns(self):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : '10000',
+            'is_withdrawal' : False
+        }
+
+        headers = {
+            'HTTP_Authorization' : access_token,
+            'content_type'       :'application/json'
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post('/accounts/1/transactions', request_body, **headers)
+
+        updates = [query['sql'] for query in queries if query['sql'].startswith(('UPDATE "accounts"', 'UPDATE "users"'))]
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(updates), 2)
+        self.assertTrue(all('"password"' not in sql for sql in updates))
+        self.assertEqual(Account.objects.get(id=1).balance, Decimal('110000.0000'))
+        self.assertEqual(User.objects.get(id=1).credit, 40000)
+
+    @override_settings(BCRYPT_PIN_ROUNDS = 4)
+    def test_post_rehashes_pin_at_configured_cost(self):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : '10000',
+            'is_withdrawal' : False
+        }
+
+        for _ in range(2):
+            response = client.post(
+                '/accounts/1/transactions', request_body, HTTP_Authorization=access_token, content_type='application/json'
+            )
+
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(hash_rounds(Account.objects.get(id = 1).password), 4)
+
+    def authorize(self, account_id=1, password='1234'):
+        return client.post(
+            f'/accounts/{account_id}/authorizations', {'password': password}, HTTP_Authorization=access_token, content_type='application/json'
+        )
+
+    def post_with_account_token(self, account_token, account_id=1):
+        request_body = {
+            'account_token' : account_token,
+            'amount'        : '10000',
+            'is_withdrawal' : False
+        }
+
+        return client.post(
+            f'/accounts/{account_id}/transactions', request_body, HTTP_Authorization=access_token, content_type='application/json'
+        )
+
+    def test_account_token_replaces_password(self):
+        response = self.authorize()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['expires_in'], 120)
+
+        account_token = response.json()['account_token']
+
+        for _ in range(2):
+            self.assertEqual(self.post_with_account_token(account_token).status_code, 201)
+
+        self.assertEqual(Account.objects.get(id = 1).balance, Decimal('120000.0000'))
+
+    def test_account_authorization_fails(self):
+        self.assertEqual(self.authorize(password = '4321').status_code, 401)
+        self.assertEqual(self.authorize(account_id = 2).status_code, 403)
+
+    def test_invalid_account_tokens_are_rejected(self):
+        account_token = self.authorize().json()['account_token']
+
+        self.assertEqual(self.post_with_account_token(access_token).status_code, 401)
+        self.assertEqual(self.post_with_account_token(account_token, account_id = 2).status_code, 403)
+
+        with freeze_time(timezone.now() + timezone.timedelta(seconds = 121)):
+            response = self.post_with_account_token(account_token)
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['message'], 'Invalid account token')
+
+    def test_account_token_is_revoked_by_pin_change(self):
+        account_token = self.authorize().json()['account_token']
+
+        Account.objects.filter(id = 1).update(password = bcrypt.hashpw(b'4321', bcrypt.gensalt(4)))
+
+        self.assertEqual(self.post_with_account_token(account_token).status_code, 401)
+
 class GetTransactionsTest(TestCase):
     def setUp(self):        
         self.freezer = freeze_time('2022-10-30')
@@ -342,7 +489,7 @@ class GetTransactionsTest(TestCase):
             timedelta         = timezone.timedelta(days=i)
             now               = timezone.datetime(2022,10,30)
             summary           = user.last_name + user.first_name
-            int_unix_time     = (now - timedelta).timestamp()
+            int_unix_time     = TimeTransform(now - timedelta, 'datetime').micro_unix_time
 
             if i%2 ==0:
                 BALANCE -= amount
@@ -1056,4 +1203,1865 @@ class GetTransactionsTest(TestCase):
         expected_response = {'message' : 'Invalid start date'}
 
         self.assertEqual(response.json(), expected_response)
-        self.assertEqual(response.status_code, 400)
\ No newline at end of file
+        self.assertEqual(response.status_code, 400)
+
+    def test_success_case_query_cursor_first_page(self):
+        headers = {'HTTP_Authorization' : access_token,}
+
+        response = client.get('/accounts/1/transactions?cursor=&limit=3', **headers)
+
+        expected_response = client.get('/accounts/1/transactions?limit=3', **headers).json()['transactions']
+
+        self.assertEqual(response.json()['transactions'], expected_response)
+        self.assertEqual(response.json()['has_more'], True)
+        self.assertIsNotNone(response.json()['next_cursor'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_success_case_query_cursor_follow_pages(self):
+        headers = {'HTTP_Authorization' : access_token,}
+
+        expected_response = client.get('/accounts/1/transactions?limit=30', **headers).json()['transactions']
+
+        pages, cursor = [], ''
+
+        for _ in range(3):
+            response = client.get(f'/accounts/1/transactions?cursor={cursor}&limit=10', **headers).json()
+            pages   += response['transactions']
+            cursor   = response['next_cursor']
+
+        self.assertEqual(pages, expected_response)
+
+    def test_success_case_query_cursor_last_page(self):
+        headers = {'HTTP_Authorization' : access_token,}
+
+        response = client.get('/accounts/1/transactions?cursor=&order-key=oldest&start-date=2022-10-27', **headers)
+
+        self.assertEqual(len(response.json()['transactions']), 3)
+        self.assertEqual(response.json()['has_more'], False)
+        self.assertEqual(response.json()['next_cursor'], None)
+
+    def test_success_case_query_cursor_same_timestamp(self):
+        headers = {'HTTP_Authorization' : access_token,}
+
+        timestamp = TimeTransform(timezone.datetime(2022,10,29,12), 'datetime').micro_unix_time
+
+        for summary in ['first', 'second', 'third']:
+            Transaction.objects.create(
+                is_withdrawal = False,
+                account_id    = 1,
+                summary       = summary,
+                timestamp     = timestamp,
+                amount        = 1,
+                balance       = 1
+            )
+
+        summaries, cursor = [], ''
+
+        for _ in range(3):
+            response   = client.get(f'/accounts/1/transactions?cursor={cursor}&limit=1', **headers).json()
+            summaries += [transaction['summary'] for transaction in response['transactions']]
+            cursor     = response['next_cursor']
+
+        self.assertEqual(summaries, ['third', 'second', 'first'])
+
+    def test_fail_case_query_invalid_cursor(self):
+        headers = {'HTTP_Authorization' : access_token,}
+
+        response = client.get('/accounts/1/transactions?cursor=invalid', **headers)
+
+        expected_response = {'message' : 'Invalid cursor'}
+
+        self.assertEqual(response.json(), expected_response)
+        self.assertEqual(response.status_code, 400)
+
+class GroupCommitTest(TestCase):
+    def setUp(self):
+        user = User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 50000
+            )
+
+        AccountType.objects.create(name = '일반예금')
+
+        Account.objects.create(
+            account_number = sample_binary,
+            password       = hashed_password,
+            balance        = balance,
+            type_id        = 1,
+            user           = user
+        )
+
+    def tearDown(self):
+        Transaction.objects.all().delete()
+        Account.objects.all().delete()
+        AccountType.objects.all().delete()
+        User.objects.all().delete()
+
+    def test_commit_entries_chains_balances(self):
+        entries = [
+            LedgerEntry(1, 10000, False, 'deposit'),
+            LedgerEntry(1, 200000, True, 'overdraw'),
+            LedgerEntry(1, 5000, True, 'withdrawal'),
+            LedgerEntry(1, 50000, False, 'over credit'),
+        ]
+
+        with self.assertNumQueries(11):
+            rows = commit_entries(1, entries)
+
+        self.assertEqual([row.balance for row in rows], [Decimal('110000.0000'), Decimal('105000.0000')])
+        self.assertEqual([entry.transaction_row for entry in entries], [rows[0], None, rows[1], None])
+        self.assertEqual(str(entries[1].error), 'Insufficient balance')
+        self.assertEqual(str(entries[3].error), 'Dont have enough credit')
+        self.assertEqual(Account.objects.get(id=1).balance, Decimal('105000.0000'))
+        self.assertEqual(User.objects.get(id=1).credit, 45000)
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    @override_settings(TRANSACTION_GROUP_COMMIT=True)
+    def test_deposit_success_case_group_commit(self):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : '10000',
+            'is_withdrawal' : False
+        }
+
+        headers = {
+            'HTTP_Authorization' : access_token,
+            'content_type'       :'application/json'
+        }
+
+        response = client.post('/accounts/1/transactions', request_body, **headers)
+
+        expected_response = {
+            'Balance after transaction' : '110000.0000', 
+            'Transaction amount'        : 10000
+            }
+
+        self.assertEqual(response.json(), expected_response)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.headers['Location'],'/transactions/1')
+
+    @override_settings(TRANSACTION_GROUP_COMMIT=True)
+    def test_withdrawal_fail_case_group_commit_insufficient_balance(self):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : '100001',
+            'is_withdrawal' : True
+        }
+
+        headers = {
+            'HTTP_Authorization' : access_token,
+            'content_type'       :'application/json'
+        }
+
+        response = client.post('/accounts/1/transactions', request_body, **headers)
+
+        self.assertEqual(response.json(), {'message' : 'Insufficient balance'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_group_commit_queue_coalesces_concurrent_entries(self):
+        batches = []
+
+        def commit(account_id, entries):
+            time.sleep(0.05)
+            batches.append(len(entries))
+
+            for entry in entries:
+                entry.transaction_row = entry.summary
+
+        queue   = GroupCommitQueue(commit=commit)
+        results = []
+        threads = [
+            threading.Thread(target=lambda i=i: results.append(queue.submit(LedgerEntry(1, 1, False, i))))
+            for i in range(10)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), list(range(10)))
+        self.assertEqual(sum(batches), 10)
+        self.assertLess(len(batches), 10)
+
+class TransactionBatchViewTest(TestCase):
+    def setUp(self):
+        user1 = User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 50000
+            )
+
+        user2 = User.objects.create(
+            first_name = '병동',
+            last_name  = '백',
+            username   = 'user2',
+            password   = hashed_password,
+            credit     = 500000
+            )
+
+        AccountType.objects.create(name = '일반예금')
+
+        for user in [user1, user1, user2]:
+            Account.objects.create(
+                account_number = sample_binary,
+                password       = hashed_password,
+                balance        = balance,
+                type_id        = 1,
+                user           = user
+            )
+
+    def tearDown(self):
+        Transaction.objects.all().delete()
+        Account.objects.all().delete()
+        AccountType.objects.all().delete()
+        User.objects.all().delete()
+
+    def test_batch_success_case(self):
+        request_body = {
+            'accounts' : [
+                {
+                    'account_id'   : 1,
+                    'password'     : '1234',
+                    'transactions' : [
+                        {'amount' : '10000', 'is_withdrawal' : False, 'summary' : '예금하기'},
+                        {'amount' : '5000', 'is_withdrawal' : True}
+                    ]
+                },{
+                    'account_id'   : 2,
+                    'password'     : '1234',
+                    'transactions' : [{'amount' : '20000', 'is_withdrawal' : True}]
+                }
+            ]
+        }
+
+        headers = {
+            'HTTP_Authorization' : access_token,
+            'content_type'       :'application/json'
+        }
+
+        response = client.post('/accounts/transactions/batch', request_body, **headers)
+
+        expected_response = [
+            {
+                'account_id'                : 1,
+                'Balance after transaction' : '110000.0000',
+                'Transaction amount'        : 10000,
+                'Location'                  : '/transactions/1'
+            },{
+                'account_id'                : 1,
+                'Balance after transaction' : '105000.0000',
+                'Transaction amount'        : 5000,
+                'Location'                  : '/transactions/2'
+            },{
+                'account_id'                : 2,
+                'Balance after transaction' : '80000.0000',
+                'Transaction amount'        : 20000,
+                'Location'                  : '/transactions/3'
+            }
+        ]
+
+        self.assertEqual(response.json(), {'results' : expected_response})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(User.objects.get(id=1).credit, 65000)
+        self.assertEqual(Transaction.objects.get(id=2).summary, '홍길동')
+
+    def test_batch_fail_case_insufficient_balance_rolls_back(self):
+        request_body = {
+            'accounts' : [
+                {
+                    'account_id'   : 1,
+                    'password'     : '1234',
+                    'transactions' : [{'amount' : '10000', 'is_withdrawal' : False}]
+                },{
+                    'account_id'   : 2,
+                    'password'     : '1234',
+                    'transactions' : [
+                        {'amount' : '20000', 'is_withdrawal' : True},
+                        {'amount' : '90000', 'is_withdrawal' : True}
+                    ]
+                }
+            ]
+        }
+
+        headers = {
+            'HTTP_Authorization' : access_token,
+            'content_type'       :'application/json'
+        }
+
+        response = client.post('/accounts/transactions/batch', request_body, **headers)
+
+        expected_response = {'message' : 'Insufficient balance at accounts[1].transactions[1]'}
+
+        self.assertEqual(response.json(), expected_response)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(Account.objects.get(id=1).balance, balance)
+        self.assertEqual(User.objects.get(id=1).credit, 50000)
+
+    def test_batch_fail_case_wrong_password(self):
+        request_body = {
+            'accounts' : [
+                {
+                    'account_id'   : 1,
+                    'password'     : '1231',
+                    'transactions' : [{'amount' : '10000', 'is_withdrawal' : False}]
+                }
+            ]
+        }
+
+        headers = {
+            'HTTP_Authorization' : access_token,
+            'content_type'       :'application/json'
+        }
+
+        response = client.post('/accounts/transactions/batch', request_body, **headers)
+
+        self.assertEqual(response.json(), {'message' : 'Invalid password'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_batch_fail_case_dont_have_permission(self):
+        request_body = {
+            'accounts' : [
+                {
+                    'account_id'   : 3,
+                    'password'     : '1234',
+                    'transactions' : [{'amount' : '10000', 'is_withdrawal' : False}]
+                }
+            ]
+        }
+
+        headers = {
+            'HTTP_Authorization' : access_token,
+            'content_type'       :'application/json'
+        }
+
+        response = client.post('/accounts/transactions/batch', request_body, **headers)
+
+        self.assertEqual(response.json(), {'message' : 'Dont have permission'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_batch_fail_case_invalid_item(self):
+        request_body = {
+            'accounts' : [
+                {
+                    'account_id'   : 1,
+                    'password'     : '1234',
+                    'transactions' : [{'amount' : '-10000', 'is_withdrawal' : False}]
+                }
+            ]
+        }
+
+        headers = {
+            'HTTP_Authorization' : access_token,
+            'content_type'       :'application/json'
+        }
+
+        response = client.post('/accounts/transactions/batch', request_body, **headers)
+
+        self.assertEqual(response.json(), {'message' : 'Invalid amount'})
+        self.assertEqual(response.status_code, 400)
+
+class TransactionExportTest(TestCase):
+    def setUp(self):
+        self.freezer = freeze_time('2022-10-30')
+        self.freezer.start()
+
+        user = User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 50000
+            )
+
+        AccountType.objects.create(name = '일반예금')
+
+        account = Account.objects.create(
+            account_number = sample_binary,
+            password       = hashed_password,
+            balance        = balance,
+            type_id        = 1,
+            user           = user
+        )
+
+        Transaction.objects.bulk_create([
+            Transaction(
+                is_withdrawal = i % 2 == 0,
+                account       = account,
+                summary       = f'거래{i}',
+                timestamp     = TimeTransform(timezone.datetime(2022,10,30) - timezone.timedelta(days=i), 'datetime').micro_unix_time,
+                amount        = 10000,
+                balance       = balance
+            ) for i in range(1, 6)
+        ])
+
+    def tearDown(self):
+        Transaction.objects.all().delete()
+        Account.objects.all().delete()
+        AccountType.objects.all().delete()
+        User.objects.all().delete()
+        self.freezer.stop()
+
+    def test_success_case_export_csv(self):
+        headers = {'HTTP_Authorization' : access_token,}
+
+        response = client.get('/accounts/1/transactions/export?transaction-type=withdrawal', **headers)
+
+        expected_response = [
+            'id,timestamp,amount,balance,is_withdrawal,summary',
+            '2,2022-10-28T00:00:00+09:00,10000.0000,100000.0000,true,거래2',
+            '4,2022-10-26T00:00:00+09:00,10000.0000,100000.0000,true,거래4',
+        ]
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(b''.join(response.streaming_content).decode('utf-8').splitlines(), expected_response)
+
+    def test_success_case_export_ndjson(self):
+        headers = {'HTTP_Authorization' : access_token,}
+
+        response = client.get('/accounts/1/transactions/export?format=ndjson&order-key=oldest', **headers)
+
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual([json.loads(line)['summary'] for line in lines], ['거래5', '거래4', '거래3', '거래2', '거래1'])
+        self.assertEqual(json.loads(lines[0]), {
+            'id'            : 5,
+            'timestamp'     : '2022-10-25T00:00:00+09:00',
+            'amount'        : '10000.0000',
+            'balance'       : '100000.0000',
+            'is_withdrawal' : False,
+            'summary'       : '거래5'
+        })
+
+    def test_export_ignores_paging_parameters(self):
+        headers = {'HTTP_Authorization' : access_token,}
+        third   = Transaction.objects.get(summary = '거래3')
+        cursor  = CursorTransform.encode(third.timestamp, third.id)
+
+        response = client.get(f'/accounts/1/transactions/export?format=ndjson&offset=x&limit=0&cursor={cursor}', **headers)
+
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([json.loads(line)['summary'] for line in lines], ['거래1', '거래2', '거래3', '거래4', '거래5'])
+
+    def test_export_sends_header_before_query(self):
+        headers = {'HTTP_Authorization' : access_token,}
+
+        response = client.get('/accounts/1/transactions/export', **headers)
+
+        with self.assertNumQueries(0):
+            first_chunk = next(iter(response.streaming_content))
+
+        self.assertEqual(first_chunk, b'id,timestamp,amount,balance,is_withdrawal,summary\r\n')
+
+    def test_fail_case_export_invalid_format(self):
+        headers = {'HTTP_Authorization' : access_token,}
+
+        response = client.get('/accounts/1/transactions/export?format=xml', **headers)
+
+        self.assertEqual(response.json(), {'message' : 'Invalid format'})
+        self.assertEqual(response.status_code, 400)
+
+class TransactionSummaryTest(TestCase):
+    def setUp(self):
+        user = User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 500000
+            )
+
+        AccountType.objects.create(name = '일반예금')
+
+        Account.objects.create(
+            account_number = sample_binary,
+            password       = hashed_password,
+            balance        = balance,
+            type_id        = 1,
+            user           = user
+        )
+
+        for day, amount, is_withdrawal in [(1, '10000', False), (1, '3000', True), (3, '5000', True), (5, '20000', False)]:
+            with freeze_time(f'2022-10-0{day} 12:00:00'):
+                self.post_transaction(amount, is_withdrawal)
+
+    def tearDown(self):
+        DailyRollup.objects.all().delete()
+        Transaction.objects.all().delete()
+        Account.objects.all().delete()
+        AccountType.objects.all().delete()
+        User.objects.all().delete()
+
+    def post_transaction(self, amount, is_withdrawal):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : amount,
+            'is_withdrawal' : is_withdrawal
+        }
+
+        headers = {
+            'HTTP_Authorization' : access_token,
+            'content_type'       :'application/json'
+        }
+
+        return client.post('/accounts/1/transactions', request_body, **headers)
+
+    def test_rollups_follow_transactions(self):
+        rollups = DailyRollup.objects.order_by('date').values_list(
+            'date', 'deposit_amount', 'deposit_count', 'withdrawal_amount', 'withdrawal_count', 'opening_balance', 'closing_balance'
+        )
+
+        expected_rollups = [
+            (timezone.datetime(2022,10,1).date(), Decimal('10000'), 1, Decimal('3000'), 1, Decimal('100000'), Decimal('107000')),
+            (timezone.datetime(2022,10,3).date(), Decimal('0'), 0, Decimal('5000'), 1, Decimal('107000'), Decimal('102000')),
+            (timezone.datetime(2022,10,5).date(), Decimal('20000'), 1, Decimal('0'), 0, Decimal('102000'), Decimal('122000')),
+        ]
+
+        self.assertEqual(list(rollups), expected_rollups)
+
+    def test_success_case_summary(self):
+        headers = {'HTTP_Authorization' : access_token,}
+
+        with self.assertNumQueries(5):
+            response = client.get('/accounts/1/transactions/summary?start-date=2022-10-02&end-date=2022-10-04', **headers)
+
+        expected_response = {
+            'start_date'        : '2022-10-02',
+            'end_date'          : '2022-10-04',
+            'opening_balance'   : '107000.0000',
+            'closing_balance'   : '102000.0000',
+            'deposit_amount'    : '0.0000',
+            'deposit_count'     : 0,
+            'withdrawal_amount' : '5000.0000',
+            'withdrawal_count'  : 1
+        }
+
+        self.assertEqual(response.json(), {'summary' : expected_response})
+        self.assertEqual(response.status_code, 200)
+
+    def test_success_case_summary_without_activity(self):
+        headers = {'HTTP_Authorization' : access_token,}
+
+        response = client.get('/accounts/1/transactions/summary?start-date=2022-09-01&end-date=2022-09-30', **headers)
+
+        self.assertEqual(response.json()['summary']['opening_balance'], '100000.0000')
+        self.assertEqual(response.json()['summary']['closing_balance'], '100000.0000')
+        self.assertEqual(response.json()['summary']['deposit_count'], 0)
+
+    def test_success_case_summary_whole_range(self):
+        headers = {'HTTP_Authorization' : access_token,}
+
+        response = client.get('/accounts/1/transactions/summary?start-date=2022-10-01&end-date=2022-10-31', **headers)
+
+        self.assertEqual(response.json()['summary']['opening_balance'], '100000.0000')
+        self.assertEqual(response.json()['summary']['closing_balance'], '122000.0000')
+        self.assertEqual(response.json()['summary']['deposit_amount'], '30000.0000')
+        self.assertEqual(response.json()['summary']['withdrawal_count'], 2)
+
+@override_settings(ROOT_URLCONF='config.asgi_urls')
+class AsyncTransactionViewTest(TestCase):
+    def setUp(self):
+        user = User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 50000
+            )
+
+        AccountType.objects.create(name = '일반예금')
+
+        Account.objects.create(
+            account_number = sample_binary,
+            password       = hashed_password,
+            balance        = balance,
+            type_id        = 1,
+            user           = user
+        )
+
+    def tearDown(self):
+        DailyRollup.objects.all().delete()
+        Transaction.objects.all().delete()
+        Account.objects.all().delete()
+        AccountType.objects.all().delete()
+        User.objects.all().delete()
+        cache.clear()
+
+    async def test_async_deposit_success_case(self):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : '10000',
+            'is_withdrawal' : False
+        }
+
+        response = await AsyncClient().post(
+            '/accounts/1/transactions', request_body, content_type='application/json', AUTHORIZATION=access_token
+        )
+
+        expected_response = {
+            'Balance after transaction' : '110000.0000',
+            'Transaction amount'        : 10000
+            }
+
+        self.assertEqual(response.json(), expected_response)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.headers['Location'],'/transactions/1')
+
+    async def test_async_deposit_fail_case_wrong_password(self):
+        request_body = {
+            'password'      : '1231',
+            'amount'        : '10000',
+            'is_withdrawal' : False
+        }
+
+        response = await AsyncClient().post(
+            '/accounts/1/transactions', request_body, content_type='application/json', AUTHORIZATION=access_token
+        )
+
+        self.assertEqual(response.json(), {'message': 'Invalid password'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_async_get_success_case(self):
+        with freeze_time('2022-10-30'):
+            await Transaction.objects.acreate(
+                is_withdrawal = False,
+                account_id    = 1,
+                summary       = '홍길동',
+                timestamp     = TimeTransform(timezone.datetime(2022,10,29), 'datetime').micro_unix_time,
+                amount        = 10000,
+                balance       = 110000
+            )
+
+            response = await AsyncClient().get('/accounts/1/transactions?cursor=', AUTHORIZATION=access_token)
+
+        expected_response = {
+            'transactions' : [{
+                'amount'        : '10000.0000',
+                'balance'       : '110000.0000',
+                'summary'       : '홍길동',
+                'timestamp'     : '2022-10-29T00:00:00+09:00',
+                'is_withdrawal' : False
+            }],
+            'next_cursor'  : None,
+            'has_more'     : False
+        }
+
+        self.assertEqual(response.json(), expected_response)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(READ_REPLICAS=['replica'], READ_YOUR_WRITES_SECONDS=5)
+    async def test_async_deposit_keeps_reads_on_default(self):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : '10000',
+            'is_withdrawal' : False
+        }
+
+        self.assertEqual(await aread_database(1), 'replica')
+
+        response = await AsyncClient().post(
+            '/accounts/1/transactions', request_body, content_type='application/json', AUTHORIZATION=access_token
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(await aread_database(1))
+        self.assertIsNone(read_database(1))
+
+    async def test_async_fail_case_without_access_token(self):
+        response = await AsyncClient().get('/accounts/1/transactions')
+
+        self.assertEqual(response.json(), {'message': 'Invalid token'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_async_signin_success_case(self):
+        response = await AsyncClient().post(
+            '/auth/users/signin', {'username' : 'user1', 'password' : '1234'}, content_type='application/json'
+        )
+
+        self.assertEqual(response.json(), {'access_token' : access_token})
+        self.assertEqual(response.status_code, 200)
+
+class InstrumentationMiddlewareTest(TestCase):
+    def setUp(self):
+        user = User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 50000
+            )
+
+        AccountType.objects.create(name = '일반예금')
+
+        Account.objects.create(
+            account_number = sample_binary,
+            password       = hashed_password,
+            balance        = balance,
+            type_id        = 1,
+            user           = user
+        )
+
+    def tearDown(self):
+        DailyRollup.objects.all().delete()
+        Transaction.objects.all().delete()
+        Account.objects.all().delete()
+        AccountType.objects.all().delete()
+        User.objects.all().delete()
+
+    def test_server_timing_header_and_log(self):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : '10000',
+            'is_withdrawal' : False
+        }
+
+        headers = {
+            'HTTP_Authorization' : access_token,
+            'content_type'       :'application/json'
+        }
+
+        with self.assertLogs('apps.request', 'INFO') as logs:
+            with CaptureQueriesContext(connection) as queries:
+                response = client.post('/accounts/1/transactions', request_body, **headers)
+
+        record = json.loads(logs.records[0].getMessage())
+
+        self.assertEqual(response.status_code, 201)
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, ')
+        self.assertIn('bcrypt;dur=', response['Server-Timing'])
+        self.assertIn('jwt;dur=', response['Server-Timing'])
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+        self.assertEqual(record['status'], 201)
+        self.assertEqual(record['path'], '/accounts/1/transactions')
+        self.assertEqual(record['db_queries'], len(queries))
+        self.assertGreater(record['bcrypt_ms'], 0)
+
+    def test_server_timing_without_queries(self):
+        response = client.get('/accounts/1/transactions')
+
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn('db;', response['Server-Timing'])
+
+    async def test_server_timing_on_async_stack(self):
+        async def get_response(request):
+            return JsonResponse({})
+
+        middleware = InstrumentationMiddleware(get_response)
+
+        with self.assertLogs('apps.request', 'INFO') as logs:
+            response = await AsyncClient().get('/accounts/1/transactions')
+
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        self.assertEqual(response.status_code, 401)
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+')
+        self.assertEqual(json.loads(logs.records[0].getMessage())['status'], 401)
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        user = User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 50000
+            )
+
+        AccountType.objects.create(name = '일반예금')
+
+        Account.objects.create(
+            account_number = sample_binary,
+            password       = hashed_password,
+            balance        = balance,
+            type_id        = 1,
+            user           = user
+        )
+
+        registry.reset()
+
+    def tearDown(self):
+        DailyRollup.objects.all().delete()
+        Transaction.objects.all().delete()
+        Account.objects.all().delete()
+        AccountType.objects.all().delete()
+        User.objects.all().delete()
+        registry.reset()
+
+    def post_transaction(self, amount, is_withdrawal):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : amount,
+            'is_withdrawal' : is_withdrawal
+        }
+
+        return client.post(
+            '/accounts/1/transactions', request_body, HTTP_Authorization=access_token, content_type='application/json'
+        )
+
+    def test_request_and_rejection_metrics(self):
+        self.post_transaction('10000', False)
+        self.post_transaction('99999999', True)
+        client.get('/accounts/1/transactions')
+
+        response = client.get('/internal/metrics')
+        body     = response.content.decode()
+        view     = 'apps.transaction.views.TransactionView'
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(f'http_requests_total{{view="{view}",method="POST",status="201"}} 1\n', body)
+        self.assertIn(f'http_requests_total{{view="{view}",method="POST",status="400"}} 1\n', body)
+        self.assertIn(f'http_requests_total{{view="{view}",method="GET",status="401"}} 1\n', body)
+        self.assertIn('exceptions_total{exception="BadRequestException",reason="Insufficient balance"} 1\n', body)
+        self.assertIn('transaction_rejections_total{reason="insufficient_balance"} 1\n', body)
+        self.assertIn(f'http_request_duration_seconds_count{{view="{view}"}} 3\n', body)
+        self.assertIn(f'http_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} 3\n', body)
+        self.assertIn(f'db_query_duration_seconds_count{{view="{view}"}} 3\n', body)
+        self.assertIn('# TYPE http_request_duration_seconds histogram\n', body)
+
+    def test_batch_rejection_reason_is_bounded(self):
+        request_body = {
+            'accounts' : [
+                {
+                    'account_id'   : 1,
+                    'password'     : '1234',
+                    'transactions' : [{'amount' : '99999999', 'is_withdrawal' : True}]
+                }
+            ]
+        }
+
+        client.post('/accounts/transactions/batch', request_body, HTTP_Authorization=access_token, content_type='application/json')
+
+        body = client.get('/internal/metrics').content.decode()
+
+        self.assertIn(
+            'exceptions_total{exception="BadRequestException",reason="Insufficient balance at accounts[].transactions[]"} 1\n', body
+        )
+        self.assertIn('transaction_rejections_total{reason="insufficient_balance"} 1\n', body)
+
+    def test_metrics_are_added_up_across_workers(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR = directory):
+            self.post_transaction('10000', False)
+
+            other_worker = {
+                'http_requests_total'           : [[['apps.transaction.views.TransactionView', 'POST', '201'], 4]],
+                'http_request_duration_seconds' : [[['apps.transaction.views.TransactionView'], [[1] + [0] * 13, 0.5]]],
+            }
+
+            with open(os.path.join(directory, 'metrics-999999999.json'), 'w') as file:
+                json.dump(other_worker, file)
+
+            body = client.get('/internal/metrics').content.decode()
+
+            self.assertTrue(os.path.exists(os.path.join(directory, f'metrics-{os.getpid()}.json')))
+
+        view = 'apps.transaction.views.TransactionView'
+
+        self.assertIn(f'http_requests_total{{view="{view}",method="POST",status="201"}} 5\n', body)
+        self.assertIn(f'http_request_duration_seconds_bucket{{view="{view}",le="0.001"}} ', body)
+        self.assertIn(f'http_request_duration_seconds_count{{view="{view}"}} 2\n', body)
+
+    def write_worker_file(self, directory, pid, requests):
+        view = 'apps.transaction.views.TransactionView'
+
+        with open(os.path.join(directory, f'metrics-{pid}.json'), 'w') as file:
+            json.dump({'http_requests_total': [[[view, 'POST', '201'], requests]]}, file)
+
+    def requests_total(self):
+        return registry.collect()['http_requests_total'][('apps.transaction.views.TransactionView', 'POST', '201')]
+
+    def test_exited_worker_is_folded_into_aggregate(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR = directory):
+            self.write_worker_file(directory, 999999999, 4)
+            registry.fold(999999999)
+
+            self.assertFalse(os.path.exists(os.path.join(directory, 'metrics-999999999.json')))
+            self.assertEqual(self.requests_total(), 4)
+
+            # A new worker that got the same pid starts from zero without hiding the old counts.
+            self.write_worker_file(directory, 999999999, 1)
+
+            self.assertEqual(self.requests_total(), 5)
+
+            registry.fold(999999999)
+
+            self.assertEqual(self.requests_total(), 5)
+            self.assertEqual(sorted(os.listdir(directory)), ['.lock', 'metrics-aggregate.json'])
+
+    def test_clear_drops_files_of_an_earlier_run(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR = directory):
+            self.write_worker_file(directory, 999999998, 3)
+            self.write_worker_file(directory, 999999999, 4)
+            registry.fold(999999999)
+
+            registry.clear()
+
+            self.assertEqual(registry.collect()['http_requests_total'], {})
+            self.assertEqual(os.listdir(directory), ['.lock'])
+
+    def test_metrics_forbidden_for_other_addresses(self):
+        response = client.get('/internal/metrics', REMOTE_ADDR='10.0.0.1')
+
+        self.assertEqual(response.status_code, 403)
+
+class TransactionPageSerializerTest(TestCase):
+    def test_matches_django_json_encoder(self):
+        serializer = TransactionPageSerializer()
+        rows       = [
+            (Decimal('10000.0000'), Decimal('110000.0000'), '홍"길동\\', 1666969200123456, False, 3),
+            (Decimal('5.5000'), Decimal('0E-4'), None, 1666882800000000, True, 2),
+        ]
+
+        expected = JsonResponse({
+            'transactions' : [
+                {
+                    'amount'        : amount,
+                    'balance'       : balance,
+                    'summary'       : summary,
+                    'timestamp'     : TimeTransform(timestamp, 'micro_unix_time').make_aware(),
+                    'is_withdrawal' : is_withdrawal
+                } for amount, balance, summary, timestamp, is_withdrawal, _ in rows
+            ],
+            'next_cursor' : 'abc',
+            'has_more'    : True
+        }).content.decode()
+
+        self.assertEqual(serializer.serialize(rows, next_cursor='abc', has_more=True), expected)
+
+    def test_utc_timestamp(self):
+        serializer = TransactionPageSerializer(datetime.timezone.utc)
+        rows       = [(Decimal('1.0000'), Decimal('1.0000'), '', 500000, False)]
+
+        self.assertRegex(serializer.serialize(rows), r'"timestamp": "[\d\-T:]+\.500Z"')
+        self.assertEqual(serializer.serialize([]), '{"transactions": []}')
+
+class TransactionIndexTest(TestCase):
+    def explain(self, query_string):
+        query = GetTransactionsQueryTransform(QueryDict(query_string))
+
+        return filter_transactions(1, query)[0].explain()
+
+    def test_all_types_use_account_timestamp_index(self):
+        for query_string in ['', 'order-key=oldest', 'cursor=', 'order-key=oldest&cursor=']:
+            plan = self.explain(query_string)
+
+            self.assertIn('USING INDEX transactions_account_ts_id (account_id=? AND timestamp>? AND timestamp<?)', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_deposit_and_withdrawal_filter_inside_the_index(self):
+        for query_string in ['transaction-type=deposit', 'transaction-type=withdrawal&order-key=oldest', 'transaction-type=withdrawal&cursor=']:
+            plan = self.explain(query_string)
+
+            self.assertIn(
+                'USING INDEX transactions_acct_type_ts_id (account_id=? AND is_withdrawal=? AND timestamp>? AND timestamp<?)', plan
+            )
+            self.assertNotIn('TEMP B-TREE', plan)
+
+class TransactionArchiveTest(TestCase):
+    def setUp(self):
+        self.freezer = freeze_time('2022-10-30')
+        self.freezer.start()
+
+        user = User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 10000000000000
+            )
+
+        AccountType.objects.create(name = '일반예금')
+
+        account = Account.objects.create(
+            account_number = sample_binary,
+            password       = hashed_password,
+            balance        = 0,
+            type_id        = 1,
+            user           = user
+        )
+
+        transactions = []
+        timestamps   = [TimeTransform(timezone.datetime(2022,10,30) - timezone.timedelta(days=i), 'datetime').micro_unix_time for i in range(100, 0, -1)]
+        timestamps  += [timestamps[69]] * 3
+
+        for index, timestamp in enumerate(sorted(timestamps)):
+            transactions.append(
+                Transaction(
+                    is_withdrawal = index % 3 == 2,
+                    account       = account,
+                    summary       = f'row{index}',
+                    timestamp     = timestamp,
+                    amount        = 1,
+                    balance       = 1000 + index
+                )
+            )
+
+        Transaction.objects.bulk_create(transactions)
+
+        self.headers = {'HTTP_Authorization' : access_token}
+
+    def tearDown(self):
+        ArchivedTransaction.objects.all().delete()
+        Transaction.objects.all().delete()
+        Account.objects.all().delete()
+        AccountType.objects.all().delete()
+        User.objects.all().delete()
+        self.freezer.stop()
+
+    def archive(self, **options):
+        call_command('archive_transactions', older_than_days=30, stdout=io.StringIO(), **options)
+
+    def walk_cursor(self, query_string):
+        summaries, cursor = [], ''
+
+        while cursor is not None:
+            body    = client.get(f'/accounts/1/transactions?{query_string}&cursor={cursor}', **self.headers).json()
+            cursor  = body['next_cursor']
+            summaries += [row['summary'] for row in body['transactions']]
+
+        return summaries
+
+    def test_command_moves_old_transactions_in_batches(self):
+        cutoff = TimeTransform(timezone.datetime(2022,9,30), 'datetime').micro_unix_time
+
+        self.archive(batch_size=7)
+
+        self.assertEqual(ArchivedTransaction.objects.count(), 73)
+        self.assertEqual(Transaction.objects.count(), 30)
+        self.assertFalse(Transaction.objects.filter(timestamp__lt=cutoff).exists())
+        self.assertFalse(ArchivedTransaction.objects.filter(timestamp__gte=cutoff).exists())
+        self.assertEqual(
+            Account.objects.get(id=1).archived_before,
+            ArchivedTransaction.objects.order_by('-timestamp').values_list('timestamp', flat=True).first()
+        )
+
+        self.archive()
+
+        self.assertEqual(ArchivedTransaction.objects.count(), 73)
+
+    def test_history_is_the_same_after_archiving(self):
+        query_strings = [
+            'start-date=2022-07-01&limit=200',
+            'start-date=2022-07-01&offset=5&limit=50',
+            'start-date=2022-07-01&order-key=oldest&offset=9&limit=80',
+            'start-date=2022-07-01&transaction-type=deposit&limit=60',
+            'start-date=2022-07-01&transaction-type=withdrawal&order-key=oldest&limit=60',
+            'start-date=2022-09-25&end-date=2022-10-05',
+        ]
+        cursor_walks = [
+            'start-date=2022-07-01&limit=7',
+            'start-date=2022-07-01&order-key=oldest&limit=6',
+            'start-date=2022-07-01&transaction-type=deposit&limit=5',
+        ]
+
+        before_pages = [client.get(f'/accounts/1/transactions?{query}', **self.headers).json() for query in query_strings]
+        before_walks = [self.walk_cursor(query) for query in cursor_walks]
+
+        self.archive(batch_size=10)
+
+        after_pages = [client.get(f'/accounts/1/transactions?{query}', **self.headers).json() for query in query_strings]
+        after_walks = [self.walk_cursor(query) for query in cursor_walks]
+
+        self.assertEqual(len(before_walks[0]), 103)
+        self.assertEqual(after_pages, before_pages)
+        self.assertEqual(after_walks, before_walks)
+
+    def test_export_is_the_same_after_archiving(self):
+        url    = '/accounts/1/transactions/export?format=ndjson&start-date=2022-07-01'
+        before = b''.join(client.get(url, **self.headers).streaming_content)
+
+        self.archive(batch_size=10)
+
+        after = b''.join(client.get(url, **self.headers).streaming_content)
+
+        self.assertEqual(after, before)
+        self.assertEqual(len(after.splitlines()), 103)
+
+    def test_ranges_read_only_the_tables_they_cover(self):
+        self.archive()
+
+        with CaptureQueriesContext(connection) as recent:
+            client.get('/accounts/1/transactions?start-date=2022-10-10', **self.headers)
+
+        with CaptureQueriesContext(connection) as old:
+            client.get('/accounts/1/transactions?start-date=2022-08-01&end-date=2022-08-31', **self.headers)
+
+        recent_sql = ' '.join(query['sql'] for query in recent)
+        old_sql    = ' '.join(query['sql'] for query in old)
+
+        self.assertNotIn('archived_transactions', recent_sql)
+        self.assertIn('FROM "transactions"', recent_sql)
+        self.assertIn('FROM "archived_transactions"', old_sql)
+        self.assertNotIn('FROM "transactions"', old_sql)
+
+@override_settings(READ_REPLICAS=['replica'], READ_YOUR_WRITES_SECONDS=5)
+class ReadReplicaRouterTest(TransactionTestCase):
+    '''
+    replica mirrors the test database through its own connection, so the tests commit
+    their data instead of running inside a transaction the replica could not see.
+    '''
+    databases       = {'default', 'replica'}
+    reset_sequences = True
+
+    def setUp(self):
+        user = User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 50000
+            )
+
+        AccountType.objects.create(name = '일반예금')
+
+        Account.objects.create(
+            account_number = sample_binary,
+            password       = hashed_password,
+            balance        = balance,
+            type_id        = 1,
+            user           = user
+        )
+
+        cache.clear()
+
+        self.headers = {'HTTP_Authorization' : access_token}
+
+    def tearDown(self):
+        DailyRollup.objects.all().delete()
+        Transaction.objects.all().delete()
+        Account.objects.all().delete()
+        AccountType.objects.all().delete()
+        User.objects.all().delete()
+        cache.clear()
+
+    def get(self, url):
+        with CaptureQueriesContext(connections['default']) as default, CaptureQueriesContext(connections['replica']) as replica:
+            response = client.get(url, **self.headers)
+
+        return response, [query['sql'] for query in default], [query['sql'] for query in replica]
+
+    def test_reads_go_to_the_replica(self):
+        tables = {
+            '/accounts/1/transactions'         : '"transactions"',
+            '/accounts/1/transactions/summary' : '"daily_rollups"',
+            '/accounts/1/transactions/export'  : '"transactions"',
+        }
+
+        for url, table in tables.items():
+            response, default_sql, replica_sql = self.get(url)
+
+            if response.streaming:
+                with CaptureQueriesContext(connections['replica']) as streamed:
+                    b''.join(response.streaming_content)
+
+                replica_sql += [query['sql'] for query in streamed]
+
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(any('"accounts"' in sql for sql in replica_sql))
+            self.assertTrue(any(table in sql for sql in replica_sql))
+            self.assertFalse(any('"accounts"' in sql or table in sql for sql in default_sql))
+
+    def test_reads_after_a_write_stay_on_default(self):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : '10000',
+            'is_withdrawal' : False
+        }
+
+        client.post('/accounts/1/transactions', request_body, content_type='application/json', **self.headers)
+
+        response, default_sql, replica_sql = self.get('/accounts/1/transactions')
+
+        self.assertEqual(len(response.json()['transactions']), 1)
+        self.assertTrue(any('"transactions"' in sql for sql in default_sql))
+        self.assertEqual(replica_sql, [])
+
+    @override_settings(READ_YOUR_WRITES_SECONDS=0.01)
+    def test_reads_return_to_the_replica_after_the_window(self):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : '10000',
+            'is_withdrawal' : False
+        }
+
+        client.post('/accounts/1/transactions', request_body, content_type='application/json', **self.headers)
+        time.sleep(0.05)
+
+        _, _, replica_sql = self.get('/accounts/1/transactions')
+
+        self.assertTrue(any('"transactions"' in sql for sql in replica_sql))
+
+    @override_settings(READ_REPLICAS=[])
+    def test_without_replicas_everything_reads_default(self):
+        _, default_sql, replica_sql = self.get('/accounts/1/transactions')
+
+        self.assertTrue(any('"transactions"' in sql for sql in default_sql))
+        self.assertEqual(replica_sql, [])
+
+@override_settings(DATABASE_LOCK_BACKOFF = 0)
+class ReadYourWritesCacheCheckTest(TestCase):
+    shared_cache = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379'}
+
+    def check_ids(self):
+        return [message.id for message in check_read_your_writes_cache(None)]
+
+    @override_settings(READ_REPLICAS = ['replica'], DEBUG = False)
+    def test_process_local_cache_with_replicas_is_an_error(self):
+        self.assertEqual(self.check_ids(), ['util.E001'])
+
+    @override_settings(READ_REPLICAS = ['replica'], DEBUG = True)
+    def test_process_local_cache_only_warns_under_debug(self):
+        self.assertEqual(self.check_ids(), ['util.W001'])
+
+    @override_settings(READ_REPLICAS = ['replica'], DEBUG = False)
+    def test_shared_cache_passes(self):
+        with override_settings(CACHES = {**settings.CACHES, 'default': self.shared_cache}):
+            self.assertEqual(self.check_ids(), [])
+
+    @override_settings(READ_REPLICAS = [], DEBUG = False)
+    def test_without_replicas_any_cache_passes(self):
+        self.assertEqual(self.check_ids(), [])
+
+    @override_settings(READ_REPLICAS = ['replica'], DEBUG = False)
+    def test_check_command_refuses(self):
+        with self.assertRaises(SystemCheckError):
+            call_command('check', stdout = io.StringIO(), stderr = io.StringIO())
+
+class SQLiteWriteTransactionTest(TransactionTestCase):
+    reset_sequences = True
+
+    def setUp(self):
+        user = User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 50000
+            )
+
+        AccountType.objects.create(name = '일반예금')
+
+        Account.objects.create(
+            account_number = sample_binary,
+            password       = hashed_password,
+            balance        = balance,
+            type_id        = 1,
+            user           = user
+        )
+
+        registry.reset()
+
+    def tearDown(self):
+        DailyRollup.objects.all().delete()
+        ArchivedTransaction.objects.all().delete()
+        Transaction.objects.all().delete()
+        Account.objects.all().delete()
+        AccountType.objects.all().delete()
+        User.objects.all().delete()
+        registry.reset()
+
+    def locked_write(self, failures):
+        calls = []
+
+        @write_transaction
+        def write():
+            calls.append(None)
+
+            Account.objects.filter(id = 1).update(balance = len(calls))
+
+            if len(calls) <= failures:
+                raise OperationalError('database is locked')
+
+            return len(calls)
+
+        return write, calls
+
+    def test_connection_gets_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA temp_store')
+            temp_store = cursor.fetchone()[0]
+            cursor.execute('PRAGMA busy_timeout')
+            busy_timeout = cursor.fetchone()[0]
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+
+        self.assertEqual(temp_store, 2)
+        self.assertEqual(busy_timeout, 5000)
+        self.assertEqual(synchronous, 1)
+
+    def test_post_begins_immediate(self):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : '10000',
+            'is_withdrawal' : False
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(
+                '/accounts/1/transactions', request_body, HTTP_Authorization=access_token, content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('BEGIN IMMEDIATE', [query['sql'] for query in queries])
+
+    def test_locked_write_is_retried(self):
+        write, calls = self.locked_write(2)
+
+        self.assertEqual(write(), 3)
+        self.assertEqual(Account.objects.get(id = 1).balance, 3)
+        self.assertEqual(database_lock_retries_total.samples(), [[[], 2]])
+        self.assertEqual(database_lock_failures_total.samples(), [])
+
+    @override_settings(DATABASE_LOCK_RETRIES = 1)
+    def test_locked_write_gives_up(self):
+        write, calls = self.locked_write(5)
+
+        with self.assertRaises(OperationalError):
+            write()
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Account.objects.get(id = 1).balance, balance)
+        self.assertEqual(database_lock_failures_total.samples(), [[[], 1]])
+
+    def test_archive_batch_begins_immediate(self):
+        Transaction.objects.create(
+            is_withdrawal = False,
+            account_id    = 1,
+            summary       = '홍길동',
+            timestamp     = 1,
+            amount        = 1,
+            balance       = 1
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            moved = archive_account(1, 2, 10)
+
+        self.assertEqual(moved, 1)
+        self.assertEqual(ArchivedTransaction.objects.count(), 1)
+        self.assertIn('BEGIN IMMEDIATE', [query['sql'] for query in queries])
+
+    def test_nested_write_is_not_retried(self):
+        write, calls = self.locked_write(1)
+
+        with self.assertRaises(OperationalError), transaction.atomic():
+            write()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(database_lock_retries_total.samples(), [])
+
+class WarmUpTest(TestCase):
+    def test_warm_up_does_not_query(self):
+        with self.assertNumQueries(0):
+            warm_up()
+
+class ApiStackTest(TestCase):
+    def test_api_stack_serves_without_browser_middleware(self):
+        middleware = [middleware for middleware in settings.MIDDLEWARE if middleware not in settings.BROWSER_MIDDLEWARE]
+
+        with override_settings(MIDDLEWARE = middleware):
+            unauthorized = client.get('/accounts/1/transactions')
+            metrics      = client.get('/internal/metrics')
+
+        self.assertEqual(unauthorized.status_code, 401)
+        self.assertEqual(metrics.status_code, 200)
+        self.assertNotIn('X-Frame-Options', metrics)
+        self.assertIn('Server-Timing', metrics)
+
+class AsgiStackTest(TestCase):
+    def setUp(self):
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+
+    def tearDown(self):
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+
+    def handler(self, **options):
+        with override_settings(MIDDLEWARE = asgi_settings.MIDDLEWARE, ROOT_URLCONF = asgi_settings.ROOT_URLCONF, **options):
+            return ASGIHandler()
+
+    async def request(self, handler, path):
+        scope = {
+            'type'         : 'http',
+            'asgi'         : {'version': '3.0'},
+            'http_version' : '1.1',
+            'method'       : 'GET',
+            'scheme'       : 'http',
+            'path'         : path,
+            'query_string' : b'',
+            'headers'      : [(b'authorization', access_token.encode('utf-8'))],
+            'server'       : ('testserver', 80),
+            'client'       : ('127.0.0.1', 50000),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        with override_settings(MIDDLEWARE = asgi_settings.MIDDLEWARE, ROOT_URLCONF = asgi_settings.ROOT_URLCONF):
+            await handler(scope, receive, send)
+
+        return messages
+
+    def test_middleware_is_not_adapted_to_sync(self):
+        # load_middleware logs every adaptation to sync when DEBUG is on.
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            handler = self.handler(DEBUG = True)
+
+        self.assertTrue(asyncio.iscoroutinefunction(handler._middleware_chain))
+
+    async def test_export_is_not_served_over_asgi(self):
+        messages = await self.request(self.handler(), '/accounts/1/transactions/export')
+
+        self.assertEqual(messages[0]['status'], 404)
+        self.assertFalse(messages[-1].get('more_body', False))
+
+class IdempotencyKeyTest(TestCase):
+    def setUp(self):
+        user = User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 50000
+            )
+
+        AccountType.objects.create(name = '일반예금')
+
+        Account.objects.create(
+            account_number = sample_binary,
+            password       = hashed_password,
+            balance        = balance,
+            type_id        = 1,
+            user           = user
+        )
+
+    def tearDown(self):
+        IdempotencyKey.objects.all().delete()
+        DailyRollup.objects.all().delete()
+        Transaction.objects.all().delete()
+        Account.objects.all().delete()
+        AccountType.objects.all().delete()
+        User.objects.all().delete()
+
+    def post(self, key, amount='10000', password='1234'):
+        body = json.dumps({'password': password, 'amount': amount, 'is_withdrawal': False})
+
+        return client.post(
+            '/accounts/1/transactions', body, HTTP_Authorization=access_token, HTTP_IDEMPOTENCY_KEY=key,
+            content_type='application/json'
+        )
+
+    def test_retry_replays_first_response(self):
+        first  = self.post('key-1')
+        second = self.post('key-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(Account.objects.get(id = 1).balance, Decimal('110000.0000'))
+
+    def test_keys_are_separate(self):
+        self.assertEqual(self.post('key-1').status_code, 201)
+        self.assertEqual(self.post('key-2').status_code, 201)
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_key_reused_for_different_request(self):
+        self.post('key-1')
+
+        response = self.post('key-1', amount = '20000')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Idempotency key reused for a different request')
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_failed_request_releases_key(self):
+        self.assertEqual(self.post('key-1', password = '4321').status_code, 401)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        response = self.post('key-1')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+
+    def test_request_in_progress_conflicts(self):
+        self.post('key-1')
+        IdempotencyKey.objects.update(status = 0)
+
+        self.assertEqual(self.post('key-1').status_code, 409)
+
+    def test_expired_key_runs_again(self):
+        self.post('key-1')
+        IdempotencyKey.objects.update(expires_at = time_now() - 1)
+
+        response = self.post('key-1')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_response_commits_with_the_write(self):
+        # The worker dies right after the write commits, before the view returns.
+        row, _ = claim(1, 'key-1', 'fingerprint')
+        post_entry(1, LedgerEntry(1, 10000, False, '홍길동', row))
+
+        stored = IdempotencyKey.objects.get(id = row.id)
+
+        self.assertEqual(stored.status, 201)
+        self.assertGreater(stored.expires_at, time_now() + (settings.IDEMPOTENCY_KEY_TTL - 60) * TimeTransform.ONE_SECOND)
+        self.assertEqual(json.loads(bytes(stored.body))['Balance after transaction'], '110000.0000')
+
+    def test_failed_write_stores_nothing(self):
+        row, _ = claim(1, 'key-1', 'fingerprint')
+
+        with self.assertRaises(BadRequestException):
+            post_entry(1, LedgerEntry(1, 200000, True, '홍길동', row))
+
+        self.assertEqual(IdempotencyKey.objects.get(id = row.id).status, 0)
+
+    def test_claim_of_dead_worker_expires(self):
+        # The worker died before its write committed, leaving the key pending.
+        row, _ = claim(1, 'key-1', 'fingerprint')
+
+        self.assertLess(row.expires_at, time_now() + (settings.IDEMPOTENCY_CLAIM_TIMEOUT + 1) * TimeTransform.ONE_SECOND)
+
+        IdempotencyKey.objects.update(expires_at = time_now() - 1)
+
+        self.assertEqual(self.post('key-1').status_code, 201)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_expired_claim_does_not_write(self):
+        row, _ = claim(1, 'key-1', 'fingerprint')
+        IdempotencyKey.objects.filter(id = row.id).delete()
+
+        with self.assertRaises(ConflictException):
+            post_entry(1, LedgerEntry(1, 10000, False, '홍길동', row))
+
+        self.assertFalse(Transaction.objects.exists())
+
+    @override_settings(TRANSACTION_GROUP_COMMIT = True)
+    def test_group_commit_stores_response(self):
+        first  = self.post('key-1')
+        second = self.post('key-1')
+
+        self.assertEqual(IdempotencyKey.objects.get().status, 201)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_purge_deletes_expired_keys_in_batches(self):
+        for key in ('key-1', 'key-2', 'key-3'):
+            self.post(key)
+
+        IdempotencyKey.objects.exclude(key = 'key-3').update(expires_at = time_now() - 1)
+
+        out = io.StringIO()
+        call_command('purge_idempotency_keys', batch_size = 1, stdout = out)
+
+        self.assertIn('Deleted 2 expired idempotency keys', out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['key-3'])
+
+@override_settings(HISTORY_CACHE_ENABLED = True)
+class HistoryCacheTest(TestCase):
+    def setUp(self):
+        user = User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 50000
+            )
+
+        AccountType.objects.create(name = '일반예금')
+
+        Account.objects.create(
+            account_number = sample_binary,
+            password       = hashed_password,
+            balance        = balance,
+            type_id        = 1,
+            user           = user
+        )
+
+        caches['history'].clear()
+
+    def tearDown(self):
+        DailyRollup.objects.all().delete()
+        Transaction.objects.all().delete()
+        Account.objects.all().delete()
+        AccountType.objects.all().delete()
+        User.objects.all().delete()
+        caches['history'].clear()
+
+    def get(self, url='/accounts/1/transactions'):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, HTTP_Authorization=access_token)
+
+        return response, any('"transactions"' in query['sql'] for query in queries)
+
+    def deposit(self, amount):
+        request_body = {
+            'password'      : '1234',
+            'amount'        : amount,
+            'is_withdrawal' : False
+        }
+
+        return client.post(
+            '/accounts/1/transactions', request_body, HTTP_Authorization=access_token, content_type='application/json'
+        )
+
+    def test_repeated_page_is_served_from_cache(self):
+        self.deposit('10000')
+
+        first, first_queried   = self.get()
+        second, second_queried = self.get()
+
+        self.assertTrue(first_queried)
+        self.assertFalse(second_queried)
+        self.assertEqual(second.content, first.content)
+
+    def test_write_invalidates_cached_pages(self):
+        self.deposit('10000')
+        self.get()
+        self.get('/accounts/1/transactions?order-key=oldest')
+
+        self.deposit('20000')
+
+        recent, recent_queried = self.get()
+        oldest, oldest_queried = self.get('/accounts/1/transactions?order-key=oldest')
+
+        self.assertTrue(recent_queried)
+        self.assertTrue(oldest_queried)
+        self.assertEqual(len(recent.json()['transactions']), 2)
+        self.assertEqual(recent.json()['transactions'][0]['amount'], '20000.0000')
+        self.assertEqual(oldest.json()['transactions'][-1]['amount'], '20000.0000')
+
+    def test_equivalent_queries_share_an_entry(self):
+        self.get('/accounts/1/transactions?limit=10&offset=0&transaction-type=all')
+
+        _, queried = self.get()
+
+        self.assertFalse(queried)
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            history = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}
+
+            with override_settings(CACHES = {**settings.CACHES, 'history': history}):
+                self.deposit('10000')
+
+                _, first_queried  = self.get()
+                _, second_queried = self.get()
+
+                self.assertTrue(first_queried)
+                self.assertFalse(second_queried)
+                self.assertTrue(os.listdir(directory))
+
+class ConditionalHistoryTest(TestCase):
+    def setUp(self):
+        user = User.objects.create(
+            first_name = '길동',
+            last_name  = '홍',
+            username   = 'user1',
+            password   = hashed_password,
+            credit     = 50000
+            )
+
+        AccountType.objects.create(name = '일반예금')
+
+        Account.objects.create(
+            account_number = sample_binary,
+            password       = hashed_password,
+            balance        = balance,
+            type_id        = 1,
+            user           = user
+        )
+
+        Account.objects.add_balance(1, 10000)
+
+    def tearDown(self):
+        DailyRollup.objects.all().delete()
+        Transaction.objects.all().delete()
+        Account.objects.all().delete()
+        AccountType.objects.all().delete()
+        User.objects.all().delete()
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_Authorization': access_token}
+
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, **headers)
+
+        return response, [query['sql'] for query in queries]
+
+    def test_matching_etag_is_not_modified(self):
+        for url, table in [
+            ('/accounts/1/transactions', '"transactions"'),
+            ('/accounts/1/transactions/export', '"transactions"'),
+            ('/accounts/1/transactions/summary', '"daily_rollups"'),
+        ]:
+            first, _ = self.get(url)
+
+            if first.streaming:
+                b''.join(first.streaming_content)
+
+            second, queries = self.get(url, first['ETag'])
+
+            self.assertEqual(first.status_code, 200)
+            self.assertEqual(second.status_code, 304)
+            self.assertEqual(second['ETag'], first['ETag'])
+            self.assertFalse(any(table in sql for sql in queries))
+
+    def test_write_changes_etag(self):
+        first, _ = self.get('/accounts/1/transactions')
+
+        Account.objects.add_balance(1, 10000)
+
+        second, _ = self.get('/accounts/1/transactions', first['ETag'])
+
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+    def test_query_changes_etag(self):
+        recent, _ = self.get('/accounts/1/transactions')
+        oldest, _ = self.get('/accounts/1/transactions?order-key=oldest', recent['ETag'])
+
+        self.assertEqual(oldest.status_code, 200)
+        self.assertNotEqual(oldest['ETag'], recent['ETag'])
+
+    def test_cache_control_depends_on_end_date(self):
+        open_range, _   = self.get('/accounts/1/transactions')
+        closed_range, _ = self.get('/accounts/1/transactions?start-date=2020-01-01&end-date=2020-12-31')
+        summary, _      = self.get('/accounts/1/transactions/summary?start-date=2020-01-01&end-date=2020-12-31')
+
+        self.assertEqual(open_range['Cache-Control'], 'private, no-cache')
+        self.assertEqual(closed_range['Cache-Control'], 'private, max-age=31536000, immutable')
+        self.assertEqual(summary['Cache-Control'], 'private, max-age=31536000, immutable')
+
+    def test_cursor_page_of_open_range_is_not_immutable(self):
+        now = TimeTransform().get_now('int_unix_time')
+
+        for timestamp in [now - 2 * TimeTransform.ONE_SECOND, now - TimeTransform.ONE_SECOND]:
+            Transaction.objects.create(
+                is_withdrawal = False,
+                account_id    = 1,
+                summary       = '홍길동',
+                timestamp     = timestamp,
+                amount        = 1,
+                balance       = 1
+            )
+
+        first, _ = self.get('/accounts/1/transactions?cursor=&limit=1')
+        cursor   = first.json()['next_cursor']
+
+        second, _ = self.get(f'/accounts/1/transactions?cursor={cursor}&limit=1')
+
+        self.assertIsNotNone(cursor)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second['Cache-Control'], 'private, no-cache')
+
+class GenerateDatasetTest(TestCase):
+    def generate(self, **options):
+        out     = io.StringIO()
+        options = {
+            'users'                    : 3,
+            'accounts_per_user'        : 2,
+            'transactions_per_account' : 40,
+            'seed'                     : 7,
+            'until'                    : timezone.datetime(2022, 10, 30).date(),
+            'days'                     : 30,
+            'workers'                  : 1,
+            'chunk_size'               : 100,
+            **options
+        }
+
+        call_command('generate_dataset', stdout = out, **options)
+
+        return out.getvalue()
+
+    def rows(self):
+        return list(
+            Transaction.objects.order_by('id').values_list('id', 'account__account_number', 'amount', 'balance', 'is_withdrawal', 'timestamp', 'summary')
+        )
+
+    def test_counts(self):
+        output = self.generate()
+
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Account.objects.count(), 6)
+        self.assertEqual(Transaction.objects.count(), 240)
+        self.assertIn('Wrote 240 transactions', output)
+
+    def test_balance_chains(self):
+        self.generate()
+
+        start = TimeTransform(timezone.datetime(2022, 9, 30), 'datetime').micro_unix_time
+        end   = TimeTransform(timezone.datetime(2022, 10, 30), 'datetime').micro_unix_time
+
+        for account in Account.objects.all():
+            balance = 0
+
+            for row in Transaction.objects.filter(account = account).order_by('timestamp', 'id'):
+                balance += -row.amount if row.is_withdrawal else row.amount
+
+                self.assertEqual(row.balance, balance)
+                self.assertTrue(start <= row.timestamp < end)
+
+            self.assertEqual(account.balance, balance)
+            self.assertEqual(account.history_version, 40)
+
+        for user in User.objects.all():
+            balances = sum(Account.objects.filter(user = user).values_list('balance', flat=True))
+
+            self.assertEqual(user.credit, INITIAL_CREDIT - balances)
+
+    def test_rollups_match_transactions(self):
+        self.generate()
+
+        for account in Account.objects.all():
+            rollups = list(DailyRollup.objects.filter(account = account).order_by('date'))
+            rows    = Transaction.objects.filter(account = account)
+
+            self.assertEqual(sum(rollup.deposit_count + rollup.withdrawal_count for rollup in rollups), 40)
+            self.assertEqual(sum(rollup.deposit_amount for rollup in rollups), sum(row.amount for row in rows if not row.is_withdrawal))
+            self.assertEqual(rollups[0].opening_balance, 0)
+            self.assertEqual(rollups[-1].closing_balance, account.balance)
+
+            for previous, rollup in zip(rollups, rollups[1:]):
+                self.assertEqual(rollup.opening_balance, previous.closing_balance)
+
+    def test_same_seed_same_rows(self):
+        self.generate()
+        first = self.rows()
+
+        Transaction.objects.all().delete()
+        DailyRollup.objects.all().delete()
+        Account.objects.all().delete()
+        User.objects.all().delete()
+
+        self.generate(chunk_size = 7)
+
+        self.assertEqual([(row[0],) + row[2:] for row in self.rows()], [(row[0],) + row[2:] for row in first])
+
+    def test_rejects_long_usernames(self):
+        with self.assertRaises(CommandError):
+            self.generate(username_prefix = 'generated_')
@@ -1,7 +1,11 @@
 from django.urls import path
 
-from apps.transaction.views import TransactionView
+from apps.transaction.views import AccountAuthorizationView, TransactionView, TransactionBatchView, TransactionExportView, TransactionSummaryView
 
 urlpatterns = [
-    path('/<int:account_id>/transactions', TransactionView.as_view())
+    path('/<int:account_id>/transactions', TransactionView.as_view()),
+    path('/<int:account_id>/authorizations', AccountAuthorizationView.as_view()),
+    path('/<int:account_id>/transactions/export', TransactionExportView.as_view()),
+    path('/<int:account_id>/transactions/summary', TransactionSummaryView.as_view()),
+    path('/transactions/batch', TransactionBatchView.as_view())
 ]
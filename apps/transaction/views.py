@@ -1,23 +1,122 @@
-import bcrypt
+from decimal import Decimal
 
-from django.views           import View
-from django.http            import JsonResponse
-from django.db              import transaction
-from django.db.models       import Q
-from django.db.utils        import IntegrityError
+from asgiref.sync import sync_to_async
 
-from apps.transaction.models import Transaction, Account
-from apps.util.token         import validate_token
-from apps.util.transforms    import TimeTransform, GetTransactionsQueryTransform
-from apps.util.validators    import PostTransactionsJsonValidator
-from apps.util.exceptions    import AuthException, BadRequestException, PermissionException
+from django.conf                 import settings
+from django.views                import View
+from django.http                 import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db.models            import Sum
+from django.db.models.functions  import Coalesce
+
+from apps.transaction.models      import Account, DailyRollup
+from apps.transaction.ledger      import LedgerEntry, post_entry, commit_batch
+from apps.transaction.archive     import transaction_models, merge_rows
+from apps.transaction.idempotency import idempotent, transaction_response
+from apps.util.token              import validate_token, async_validate_token, issue_account_token, validate_account_token
+from apps.util.routers            import read_replica, record_write, arecord_write
+from apps.util.transforms         import TimeTransform, CursorTransform, GetTransactionsQueryTransform, ExportTransactionsQueryTransform, GetSummaryQueryTransform
+from apps.util.validators         import PostTransactionsJsonValidator, PostTransactionsBatchJsonValidator, PostAccountAuthorizationJsonValidator
+from apps.util.exports            import TransactionRowsExport
+from apps.util.serializers        import TransactionPageSerializer
+from apps.util.passwords          import password_hasher
+from apps.util.caches             import history_cache
+from apps.util.conditional        import history_etag, not_modified, set_history_cache_headers
+from apps.util.exceptions         import AuthException, BadRequestException, PermissionException
+
+def filter_transactions(account_id, query, archived_before=0):
+    '''
+    Querysets for a page of a GetTransactionsQueryTransform, one per table the date range touches,
+    as values_list rows of TransactionPageSerializer.columns followed by the id.
+    In cursor mode one extra row is fetched to tell whether another page follows.
+    When two tables are read each returns every row up to the end of the page and merge_transactions cuts the page.
+    '''
+    q        = query.get_filter(account_id)
+    order_by = query.order_by
+    columns  = TransactionPageSerializer.columns
+    models   = transaction_models(query, archived_before)
+
+    if query.cursor is None:
+        start, stop = query.offset, query.offset+query.limit
+    else:
+        q &= query.cursor.get_tie_breaker(query.is_descending)
+        start, stop = 0, query.limit+1
+
+    if len(models) > 1:
+        start = 0
+
+    return [model.objects.filter(q).order_by(*order_by).values_list(*columns, 'id')[start:stop] for model in models]
+
+def merge_transactions(parts, query):
+    if len(parts) == 1:
+        return parts[0]
+
+    start = query.offset if query.cursor is None else 0
+    stop  = start + query.limit if query.cursor is None else query.limit+1
+
+    return list(merge_rows(parts, query.is_descending, lambda row: (row[3], row[5]), start, stop))
+
+def transactions_page(transaction_rows, query):
+    limit      = query.limit
+    serializer = TransactionPageSerializer()
+
+    if query.cursor is None:
+        return serializer.serialize(transaction_rows)
+
+    has_more    = len(transaction_rows) > limit
+    next_cursor = None
+
+    if has_more:
+        _, _, _, timestamp, _, id = transaction_rows[limit-1]
+        next_cursor = CursorTransform.encode(timestamp, id)
+
+    return serializer.serialize(transaction_rows[:limit], next_cursor=next_cursor, has_more=has_more)
+
+class AccountAuthorizationView(View):
+    @validate_token
+    def post(self, request, account_id):
+        '''
+        request.body = {
+            password: str
+        }
+        Checks the account PIN once and returns an account token that TransactionView.post
+        accepts in place of the password until it expires.
+        '''
+        try:
+            data = PostAccountAuthorizationJsonValidator(request.body)
+            user = request.user
+
+            account = Account.objects.only('user_id', 'password').get(id = account_id)
+
+            if account.user_id != user.id:
+                raise PermissionException('Dont have permission')
+
+            is_valid_password, rehashed_password = password_hasher.verify(data.password, account.password, settings.BCRYPT_PIN_ROUNDS)
+
+            if not is_valid_password:
+                raise AuthException('Invalid password')
+
+            if rehashed_password:
+                Account.objects.filter(id = account_id).update(password = rehashed_password)
+                account.password = rehashed_password
+
+            result = {
+                'account_token' : issue_account_token(user.id, account_id, account.password),
+                'expires_in'    : settings.ACCOUNT_TOKEN_TTL
+            }
+
+            return JsonResponse(result, status=201)
+
+        except Account.DoesNotExist:
+            raise BadRequestException('Does not account')
 
 class TransactionView(View):
     @validate_token
+    @idempotent
     def post(self, request, account_id):
         '''
         request.body = {
             password: str,
+            account_token: str, from AccountAuthorizationView in place of password
             summary: str,
             amount: str,
             is_withdrawal: boolean
@@ -32,53 +131,38 @@ class TransactionView(View):
             amount        = data.amount
             summary       = data.summary if data.summary else user.last_name + user.first_name
 
-            signed_amount =  -amount if is_withdrawal else amount
-
             if account_id == 0:
                 raise BadRequestException('Invalid account id')
-            
-            with transaction.atomic(using='default'):
-                account = Account.objects.get(id = account_id)
 
-                if account.user_id != user.id:
-                    raise PermissionException('Dont have permission')
+            account = Account.objects.only('user_id', 'password').get(id = account_id)
 
-                if not bcrypt.checkpw(password.encode('utf-8') , account.password):
-                    raise AuthException('Invalid password')
+            if account.user_id != user.id:
+                raise PermissionException('Dont have permission')
 
-                balance = account.balance + signed_amount
+            if data.account_token:
+                if not validate_account_token(data.account_token, user.id, account_id, account.password):
+                    raise AuthException('Invalid account token')
+            else:
+                is_valid_password, rehashed_password = password_hasher.verify(password, account.password, settings.BCRYPT_PIN_ROUNDS)
 
-                if balance < 0:
-                    raise BadRequestException('Insufficient balance')
+                if not is_valid_password:
+                    raise AuthException('Invalid password')
 
-                user.credit -= signed_amount
-                user.save()
+                if rehashed_password:
+                    Account.objects.filter(id = account_id).update(password = rehashed_password)
 
-                transaction_row = Transaction.objects.create(
-                    amount        = amount,
-                    balance       = balance,
-                    is_withdrawal = is_withdrawal,
-                    summary       = summary,
-                    account_id    = account_id
-                )
- 
-                account.balance = transaction_row.balance
-                account.save()
+            entry           = LedgerEntry(account_id, amount, is_withdrawal, summary, request.idempotency_claim)
+            transaction_row = post_entry(user.id, entry)
 
-            result  = {'Balance after transaction': account.balance, 'Transaction amount': transaction_row.amount}
-            headers = {'Location': f'/transactions/{transaction_row.id}'}
+            record_write(user.id)
 
-            return JsonResponse(result,headers = headers, status=201)
+            return transaction_response(transaction_row)
 
         except Account.DoesNotExist:
             raise BadRequestException('Does not account')
-
-        except IntegrityError as e:
-            if str(e) == 'CHECK constraint failed: credit':
-                raise BadRequestException('Dont have enough credit')
-            raise
     
     @validate_token
+    @read_replica
     def get(self, request, account_id):
         '''
         request.GET = {
@@ -88,44 +172,300 @@ class TransactionView(View):
             limit      : str(positive_int)
             start_date : ex) '2002-02-02'
             end_date   : ex) '2002-02-02'
+            cursor     : next_cursor of the previous page, empty for the first page
         }
         '''
         try:
             query = GetTransactionsQueryTransform(request.GET)
             user  = request.user
             
-            offset     = query.offset
-            limit      = query.limit
-            order_by   = query.order_by
-            start_date = query.start_date
-            end_date   = query.end_date
-            transaction_type = query.transaction_type
+            account = Account.objects.only('user_id', 'archived_before', 'history_version').get(id = account_id)
+
+            if account.user_id != user.id:
+                raise PermissionException('Dont have permission')
+
+            etag     = history_etag('page', account_id, account.history_version, query)
+            response = not_modified(request, etag, query)
+
+            if response is not None:
+                return response
 
-            account = Account.objects.get(id = account_id)
+            key  = history_cache.key(account_id, account.history_version, query)
+            page = history_cache.get(key)
+
+            if page is None:
+                parts            = [list(rows) for rows in filter_transactions(account_id, query, account.archived_before)]
+                transaction_rows = merge_transactions(parts, query)
+                page             = transactions_page(transaction_rows, query)
+
+                history_cache.set(key, page)
+
+            return set_history_cache_headers(HttpResponse(page, content_type='application/json', status=200), etag, query)
+        
+        except Account.DoesNotExist:
+            raise BadRequestException('Invalid account id')
+
+class AsyncTransactionView(View):
+    '''
+    TransactionView for the ASGI profile.
+    Reads use the async ORM, bcrypt runs on the password hasher pool and the write
+    transaction runs through sync_to_async, since atomic blocks are sync-only.
+    '''
+    @async_validate_token
+    @idempotent
+    async def post(self, request, account_id):
+        try:
+            data = PostTransactionsJsonValidator(request.body)
+            user = request.user
+
+            password      = data.password
+            is_withdrawal = data.is_withdrawal
+            amount        = data.amount
+            summary       = data.summary if data.summary else user.last_name + user.first_name
+
+            if account_id == 0:
+                raise BadRequestException('Invalid account id')
+
+            account = await Account.objects.only('user_id', 'password').aget(id = account_id)
 
             if account.user_id != user.id:
                 raise PermissionException('Dont have permission')
-            
-            q = Q(account_id=account_id)
 
-            q &= Q(timestamp__gte=start_date) & Q(timestamp__lte=end_date)
+            if data.account_token:
+                if not validate_account_token(data.account_token, user.id, account_id, account.password):
+                    raise AuthException('Invalid account token')
+            else:
+                is_valid_password, rehashed_password = await password_hasher.averify(password, account.password, settings.BCRYPT_PIN_ROUNDS)
+
+                if not is_valid_password:
+                    raise AuthException('Invalid password')
+
+                if rehashed_password:
+                    await Account.objects.filter(id = account_id).aupdate(password = rehashed_password)
+
+            entry           = LedgerEntry(account_id, amount, is_withdrawal, summary, request.idempotency_claim)
+            transaction_row = await sync_to_async(post_entry)(user.id, entry)
+
+            await arecord_write(user.id)
+
+            return transaction_response(transaction_row)
 
-            if transaction_type != 'all':
-                q &= Q(is_withdrawal = transaction_type == 'withdrawal')
+        except Account.DoesNotExist:
+            raise BadRequestException('Does not account')
+
+    @async_validate_token
+    @read_replica
+    async def get(self, request, account_id):
+        try:
+            query = GetTransactionsQueryTransform(request.GET)
+            user  = request.user
+
+            account = await Account.objects.only('user_id', 'archived_before', 'history_version').aget(id = account_id)
+
+            if account.user_id != user.id:
+                raise PermissionException('Dont have permission')
 
-            transaction_rows = Transaction.objects.filter(q).order_by(order_by)[offset: offset+limit]
+            etag     = history_etag('page', account_id, account.history_version, query)
+            response = not_modified(request, etag, query)
 
-            result = [
+            if response is not None:
+                return response
+
+            key  = history_cache.key(account_id, account.history_version, query)
+            page = await history_cache.aget(key)
+
+            if page is None:
+                parts = []
+
+                for rows in filter_transactions(account_id, query, account.archived_before):
+                    parts.append([row async for row in rows])
+
+                transaction_rows = merge_transactions(parts, query)
+                page             = transactions_page(transaction_rows, query)
+
+                await history_cache.aset(key, page)
+
+            return set_history_cache_headers(HttpResponse(page, content_type='application/json', status=200), etag, query)
+
+        except Account.DoesNotExist:
+            raise BadRequestException('Invalid account id')
+
+class TransactionBatchView(View):
+    @validate_token
+    def post(self, request):
+        '''
+        request.body = {
+            accounts: [
                 {
-                    'amount'        : transaction.amount,
-                    'balance'       : transaction.balance,
-                    'summary'       : transaction.summary,
-                    'timestamp'     : TimeTransform(transaction.timestamp).make_aware(),
-                    'is_withdrawal' : transaction.is_withdrawal
-                } for transaction in transaction_rows
+                    account_id: int,
+                    password: str,
+                    transactions: [{summary: str, amount: str, is_withdrawal: boolean}]
+                }
             ]
+        }
+        '''
+        data = PostTransactionsBatchJsonValidator(request.body, settings.TRANSACTION_BATCH_MAX_ITEMS)
+        user = request.user
+
+        account_ids = [account['account_id'] for account in data.accounts]
+        accounts    = Account.objects.only('user_id', 'password').in_bulk(account_ids)
+
+        for account_id in account_ids:
+            if account_id not in accounts:
+                raise BadRequestException('Does not account')
+
+            if accounts[account_id].user_id != user.id:
+                raise PermissionException('Dont have permission')
+
+        for account in data.accounts:
+            is_valid_password, rehashed_password = password_hasher.verify(
+                account['password'], accounts[account['account_id']].password, settings.BCRYPT_PIN_ROUNDS
+            )
+
+            if not is_valid_password:
+                raise AuthException('Invalid password')
+
+            if rehashed_password:
+                Account.objects.filter(id = account['account_id']).update(password = rehashed_password)
+
+        entries = {
+            account['account_id'] : [
+                LedgerEntry(
+                    account['account_id'],
+                    item.amount,
+                    item.is_withdrawal,
+                    item.summary if item.summary else user.last_name + user.first_name
+                ) for item in account['transactions']
+            ] for account in data.accounts
+        }
+
+        commit_batch(entries)
+
+        record_write(user.id)
+
+        result = [
+            {
+                'account_id'                : account_id,
+                'Balance after transaction' : entry.transaction_row.balance,
+                'Transaction amount'        : entry.transaction_row.amount,
+                'Location'                  : f'/transactions/{entry.transaction_row.id}'
+            } for account_id, account_entries in entries.items() for entry in account_entries
+        ]
+
+        return JsonResponse({'results':result}, status=201)
+
+class TransactionExportView(View):
+    @validate_token
+    @read_replica
+    def get(self, request, account_id):
+        '''
+        request.GET = {
+            format : csv, ndjson
+            and the filters of TransactionView.get except offset, limit and cursor
+        }
+        '''
+        try:
+            query = ExportTransactionsQueryTransform(request.GET)
+            user  = request.user
+
+            account = Account.objects.only('user_id', 'archived_before', 'history_version').get(id = account_id)
+
+            if account.user_id != user.id:
+                raise PermissionException('Dont have permission')
+
+            etag     = history_etag('export', account_id, account.history_version, query)
+            response = not_modified(request, etag, query)
+
+            if response is not None:
+                return response
+
+            querysets = [
+                model.objects.filter(query.get_filter(account_id)).order_by(*query.order_by).values_list(
+                    'id', 'timestamp', 'amount', 'balance', 'is_withdrawal', 'summary'
+                ) for model in transaction_models(query, account.archived_before)
+            ]
+
+            # The rows are read while the response streams, after read_replica has returned.
+            parts = [queryset.using(queryset.db).iterator(chunk_size=2000) for queryset in querysets]
+
+            rows = (
+                (id, TimeTransform(timestamp, 'micro_unix_time').make_aware(), amount, balance, is_withdrawal, summary)
+                for id, timestamp, amount, balance, is_withdrawal, summary in merge_rows(parts, query.is_descending, lambda row: (row[1], row[0]))
+            )
+
+            export   = TransactionRowsExport(rows, query.format)
+            response = StreamingHttpResponse(export, content_type=export.content_type)
+
+            response['Content-Disposition'] = f'attachment; filename="account-{account_id}-transactions.{query.format}"'
+
+            return set_history_cache_headers(response, etag, query)
+
+        except Account.DoesNotExist:
+            raise BadRequestException('Invalid account id')
+
+class TransactionSummaryView(View):
+    @validate_token
+    @read_replica
+    def get(self, request, account_id):
+        '''
+        request.GET = {
+            start_date : ex) '2002-02-02'
+            end_date   : ex) '2002-02-02'
+        }
+        Answered from the daily rollups, so the cost does not grow with the number of transactions.
+        '''
+        try:
+            query = GetSummaryQueryTransform(request.GET)
+            user  = request.user
+
+            start_date = query.start_date
+            end_date   = query.end_date
+
+            account = Account.objects.only('user_id', 'balance', 'history_version').get(id = account_id)
+
+            if account.user_id != user.id:
+                raise PermissionException('Dont have permission')
+
+            etag     = history_etag('summary', account_id, account.history_version, query)
+            response = not_modified(request, etag, query)
+
+            if response is not None:
+                return response
+
+            rollups = DailyRollup.objects.filter(account_id = account_id)
+
+            totals = rollups.filter(date__gte = start_date, date__lte = end_date).aggregate(
+                deposit_amount    = Coalesce(Sum('deposit_amount'), Decimal(0)),
+                deposit_count     = Coalesce(Sum('deposit_count'), 0),
+                withdrawal_amount = Coalesce(Sum('withdrawal_amount'), Decimal(0)),
+                withdrawal_count  = Coalesce(Sum('withdrawal_count'), 0)
+            )
+
+            for key in ['deposit_amount', 'withdrawal_amount']:
+                totals[key] = Decimal(totals[key]).quantize(Decimal('0.0001'))
+
+            opening_balance = rollups.filter(date__lt = start_date).order_by('-date').values_list('closing_balance', flat=True).first()
+
+            if opening_balance is None:
+                opening_balance = rollups.filter(date__gte = start_date).order_by('date').values_list('opening_balance', flat=True).first()
+
+            if opening_balance is None:
+                opening_balance = account.balance
+
+            closing_balance = rollups.filter(date__lte = end_date).order_by('-date').values_list('closing_balance', flat=True).first()
+
+            if closing_balance is None or start_date > end_date:
+                closing_balance = opening_balance
+
+            result = {
+                'start_date'        : start_date,
+                'end_date'          : end_date,
+                'opening_balance'   : opening_balance,
+                'closing_balance'   : closing_balance,
+                **totals
+            }
+
+            return set_history_cache_headers(JsonResponse({'summary':result}, status=200), etag, query)
 
-            return JsonResponse({'transactions':result}, status=200)
-        
         except Account.DoesNotExist:
-            raise BadRequestException('Invalid account id')
\ No newline at end of file
+            raise BadRequestException('Invalid account id')
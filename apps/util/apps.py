@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+
+
+class UtilConfig(AppConfig):
+    name = 'apps.util'
+
+    def ready(self):
+        from django.core                import checks
+        from django.db.backends.signals import connection_created
+
+        from apps.util.timing import install_query_timer
+        from apps.util.sqlite import configure_sqlite
+        from apps.util.checks import check_read_your_writes_cache
+
+        connection_created.connect(install_query_timer)
+        connection_created.connect(configure_sqlite)
+        checks.register(check_read_your_writes_cache)
@@ -0,0 +1,13 @@
+from django.db.backends.sqlite3 import base
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    '''
+    Django's SQLite backend, except that the next transaction opens with BEGIN IMMEDIATE
+    when begin_immediate is set. A plain BEGIN only takes the write lock at the first write,
+    so two writers that both read first can deadlock and one fails at once with database is locked.
+    BEGIN IMMEDIATE takes the lock up front, where busy_timeout can wait for it.
+    '''
+    begin_immediate = False
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE' if self.begin_immediate else 'BEGIN')
@@ -0,0 +1,128 @@
+import copy
+import time
+import threading
+
+from collections import OrderedDict
+
+from django.conf        import settings
+from django.db          import transaction
+from django.core.cache  import caches
+
+class UserCache:
+    '''
+    Per-process LRU of authenticated users keyed by (token, user id).
+    Entries expire after USER_CACHE_TTL seconds and at most USER_CACHE_MAX_SIZE are kept.
+    Every invalidation bumps the user's generation, and set() only stores a row read under the
+    current one, so a fill racing a committed update cannot put the old row back.
+    '''
+    def __init__(self):
+        self.__lock         = threading.Lock()
+        self.__entries      = OrderedDict()
+        self.__keys_by_user = {}
+        self.__generations  = {}
+
+    def get(self, token, user_id):
+        key = (token, user_id)
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+
+            if entry is None:
+                return None
+
+            expires_at, user = entry
+
+            if expires_at <= time.monotonic():
+                self.__remove(key)
+                return None
+
+            self.__entries.move_to_end(key)
+
+        return copy.copy(user)
+
+    def generation(self, user_id):
+        '''
+        Take it before reading the User row and pass it to set().
+        '''
+        with self.__lock:
+            return self.__generations.get(user_id, 0)
+
+    def set(self, token, user_id, user, generation):
+        key = (token, user_id)
+
+        with self.__lock:
+            if self.__generations.get(user_id, 0) != generation:
+                return
+
+            self.__entries[key] = (time.monotonic() + settings.USER_CACHE_TTL, copy.copy(user))
+            self.__entries.move_to_end(key)
+            self.__keys_by_user.setdefault(user_id, set()).add(key)
+
+            while len(self.__entries) > settings.USER_CACHE_MAX_SIZE:
+                self.__remove(next(iter(self.__entries)))
+
+    def invalidate(self, user_id):
+        with self.__lock:
+            self.__generations[user_id] = self.__generations.get(user_id, 0) + 1
+
+            for key in self.__keys_by_user.pop(user_id, set()):
+                self.__entries.pop(key, None)
+
+    def invalidate_on_commit(self, user_id):
+        '''
+        Drops the user now and again once the surrounding transaction commits,
+        so a request racing the commit cannot keep the old row cached.
+        '''
+        self.invalidate(user_id)
+        transaction.on_commit(lambda: self.invalidate(user_id))
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__keys_by_user.clear()
+            self.__generations.clear()
+
+    def __remove(self, key):
+        self.__entries.pop(key, None)
+
+        keys = self.__keys_by_user.get(key[1])
+
+        if keys is not None:
+            keys.discard(key)
+
+            if not keys:
+                del self.__keys_by_user[key[1]]
+
+user_cache = UserCache()
+
+class HistoryCache:
+    '''
+    Rendered transaction history pages in the CACHES['history'] backend.
+    Keys carry the account's history_version, which every write to the account bumps in the same
+    transaction, so a write makes all of the account's cached pages unreachable at once and they age out.
+    Does nothing unless HISTORY_CACHE_ENABLED is set.
+    '''
+    def key(self, account_id, history_version, query):
+        return f'history:{account_id}:{history_version}:{query.cache_key()}'
+
+    def get(self, key):
+        if not settings.HISTORY_CACHE_ENABLED:
+            return None
+
+        return caches['history'].get(key)
+
+    def set(self, key, page):
+        if settings.HISTORY_CACHE_ENABLED:
+            caches['history'].set(key, page, settings.HISTORY_CACHE_TTL)
+
+    async def aget(self, key):
+        if not settings.HISTORY_CACHE_ENABLED:
+            return None
+
+        return await caches['history'].aget(key)
+
+    async def aset(self, key, page):
+        if settings.HISTORY_CACHE_ENABLED:
+            await caches['history'].aset(key, page, settings.HISTORY_CACHE_TTL)
+
+history_cache = HistoryCache()
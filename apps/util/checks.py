@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core import checks
+
+# Cache backends whose entries are only seen by the process that wrote them.
+PROCESS_LOCAL_CACHES = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+def check_read_your_writes_cache(app_configs, **kwargs):
+    '''
+    record_write marks a user in the default cache; a worker that cannot see the mark reads a lagging replica.
+    A process-local default cache is an error unless DEBUG, where runserver serves from one process.
+    '''
+    if not settings.READ_REPLICAS or settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+
+    level = checks.Warning if settings.DEBUG else checks.Error
+
+    return [
+        level(
+            'READ_REPLICAS is set but the default cache is local to each process, '
+            'so a read on another worker right after a write can miss it.',
+            hint = 'Set DEFAULT_CACHE_BACKEND to a cache shared by every worker, e.g. django.core.cache.backends.redis.RedisCache.',
+            id   = 'util.E001' if level is checks.Error else 'util.W001',
+        )
+    ]
@@ -0,0 +1,38 @@
+import hashlib
+
+from django.conf        import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+def history_etag(kind, account_id, history_version, query):
+    '''
+    Strong ETag of a history response. Account.history_version changes with every write to the account,
+    so together with the normalized query it identifies the response body without reading the rows.
+    '''
+    digest = hashlib.sha256(f'{kind}:{account_id}:{history_version}:{query.cache_key()}'.encode('utf-8'))
+
+    return f'"{digest.hexdigest()[:32]}"'
+
+def set_history_cache_headers(response, etag, query):
+    '''
+    A query whose date range is over cannot change any more and may be kept for CLOSED_HISTORY_MAX_AGE seconds.
+    Anything else must be revalidated with the ETag each time.
+    '''
+    response['ETag'] = etag
+
+    if query.is_closed():
+        patch_cache_control(response, private=True, max_age=settings.CLOSED_HISTORY_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+
+    return response
+
+def not_modified(request, etag, query):
+    '''
+    304 response when the request's If-None-Match matches etag, else None.
+    '''
+    response = get_conditional_response(request, etag=etag)
+
+    if response is None:
+        return None
+
+    return set_history_cache_headers(response, etag, query)
@@ -23,4 +23,22 @@ class PermissionException(Exception):
         self.is_custom = True
 
     def __str__(self):
-        return self.message
\ No newline at end of file
+        return self.message
+
+class ConflictException(Exception):
+    def __init__(self, message):
+        self.message   = message
+        self.status    = 409
+        self.is_custom = True
+
+    def __str__(self):
+        return self.message
+
+class ServiceUnavailableException(Exception):
+    def __init__(self, message):
+        self.message   = message
+        self.status    = 503
+        self.is_custom = True
+
+    def __str__(self):
+        return self.message
@@ -0,0 +1,59 @@
+import csv
+import json
+
+class Echo:
+    '''
+    File-like object for csv.writer that hands each written line straight back.
+    '''
+    def write(self, value):
+        return value
+
+class TransactionRowsExport:
+    '''
+    Turns an iterator of transaction rows into chunks of CSV or NDJSON text.
+    Rows are (id, timestamp, amount, balance, is_withdrawal, summary) tuples with an aware datetime timestamp.
+    The header goes out before the first row is pulled from the iterator.
+    '''
+    fields        = ['id', 'timestamp', 'amount', 'balance', 'is_withdrawal', 'summary']
+    content_types = {'csv' : 'text/csv; charset=utf-8', 'ndjson' : 'application/x-ndjson; charset=utf-8'}
+
+    def __init__(self, rows, format, rows_per_chunk=500):
+        self.rows           = rows
+        self.format         = format
+        self.rows_per_chunk = rows_per_chunk
+        self.content_type   = self.content_types[format]
+
+    def __iter__(self):
+        if self.format == 'csv':
+            writer = csv.writer(Echo())
+            yield writer.writerow(self.fields)
+            format_row = lambda row: writer.writerow(self.__to_csv_row(row))
+        else:
+            format_row = lambda row: json.dumps(self.__to_json_row(row), ensure_ascii=False) + '\n'
+
+        chunk = []
+
+        for row in self.rows:
+            chunk.append(format_row(row))
+
+            if len(chunk) >= self.rows_per_chunk:
+                yield ''.join(chunk)
+                chunk = []
+
+        if chunk:
+            yield ''.join(chunk)
+
+    def __to_csv_row(self, row):
+        id, timestamp, amount, balance, is_withdrawal, summary = row
+        return [id, timestamp.isoformat(), amount, balance, 'true' if is_withdrawal else 'false', summary]
+
+    def __to_json_row(self, row):
+        id, timestamp, amount, balance, is_withdrawal, summary = row
+        return {
+            'id'            : id,
+            'timestamp'     : timestamp.isoformat(),
+            'amount'        : str(amount),
+            'balance'       : str(balance),
+            'is_withdrawal' : is_withdrawal,
+            'summary'       : summary
+        }
@@ -0,0 +1,36 @@
+import sqlite3
+
+from django.conf                 import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db                   import connections
+
+class Command(BaseCommand):
+    help = 'Copies the default SQLite database onto the SQLite files of the replica aliases, standing in for replication locally.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*', help='replica aliases, defaults to every alias except default')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or [alias for alias in settings.DATABASES if alias != 'default']
+        source  = connections['default']
+
+        for alias in [*aliases, 'default']:
+            if alias not in settings.DATABASES:
+                raise CommandError(f'Unknown database alias {alias}')
+
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias} is not a SQLite database')
+
+        source.ensure_connection()
+
+        for alias in aliases:
+            connections[alias].close()
+
+            target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+
+            self.stdout.write(self.style.SUCCESS(f'Copied default to {alias}'))
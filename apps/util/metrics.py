@@ -0,0 +1,323 @@
+import os
+import re
+import json
+import time
+import fcntl
+import atexit
+import bisect
+import threading
+
+from pathlib    import Path
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name       = name
+        self.help       = help
+        self.labelnames = tuple(labelnames)
+        self.__lock     = threading.Lock()
+        self.__values   = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+
+        with self.__lock:
+            self.__values[key] = self.__values.get(key, 0) + amount
+
+    def samples(self):
+        with self.__lock:
+            return [[list(key), value] for key, value in self.__values.items()]
+
+    def reset(self):
+        self.__lock   = threading.Lock()
+        self.__values = {}
+
+class Histogram:
+    '''
+    Fixed-bucket histogram. Bucket counts are kept per bucket and only made cumulative
+    when exposed, so samples from several processes can be added together.
+    '''
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name       = name
+        self.help       = help
+        self.labelnames = tuple(labelnames)
+        self.buckets    = tuple(buckets)
+        self.__lock     = threading.Lock()
+        self.__values   = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+
+        with self.__lock:
+            counts, total = self.__values.get(key, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.__values[key] = (counts, total + value)
+
+    def samples(self):
+        with self.__lock:
+            return [[list(key), [list(counts), total]] for key, (counts, total) in self.__values.items()]
+
+    def reset(self):
+        self.__lock   = threading.Lock()
+        self.__values = {}
+
+class MetricsRegistry:
+    '''
+    Metrics of this process.
+    With METRICS_DIR set every worker writes its samples to <METRICS_DIR>/metrics-<pid>.json
+    at most every METRICS_FLUSH_INTERVAL seconds, and collect() adds up the files of all
+    workers so any of them can answer for the whole server.
+    When a worker exits, fold() adds its file into metrics-aggregate.json and removes it, so counters
+    never go backwards, the directory does not grow with restarts and a new worker reusing the pid
+    starts from its own zero. clear() empties the directory when a server starts.
+    '''
+    AGGREGATE_FILE = 'metrics-aggregate.json'
+
+    def __init__(self):
+        self.__metrics    = {}
+        self.__flush_lock = threading.Lock()
+        self.__flushed_at = 0
+
+    def counter(self, name, help, labelnames=()):
+        return self.__register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.__register(Histogram(name, help, labelnames, buckets))
+
+    def snapshot(self):
+        return {name: metric.samples() for name, metric in self.__metrics.items()}
+
+    def reset(self):
+        for metric in self.__metrics.values():
+            metric.reset()
+
+        self.__flush_lock = threading.Lock()
+        self.__flushed_at = 0
+
+    def maybe_flush(self):
+        if not settings.METRICS_DIR:
+            return
+
+        if time.monotonic() - self.__flushed_at < settings.METRICS_FLUSH_INTERVAL:
+            return
+
+        self.flush()
+
+    def flush(self):
+        if not settings.METRICS_DIR:
+            return
+
+        with self.__flush_lock:
+            directory = Path(settings.METRICS_DIR)
+            directory.mkdir(parents=True, exist_ok=True)
+
+            self.__write(directory, f'metrics-{os.getpid()}.json', self.snapshot())
+
+            self.__flushed_at = time.monotonic()
+
+    def collect(self):
+        '''
+        Samples merged across every worker that has written to METRICS_DIR, this process included.
+        '''
+        snapshots = [self.snapshot()]
+
+        if settings.METRICS_DIR:
+            own_file = f'metrics-{os.getpid()}.json'
+
+            with self.__directory_lock(fcntl.LOCK_SH) as directory:
+                for path in directory.glob('metrics-*.json'):
+                    if path.name == own_file:
+                        continue
+
+                    snapshot = self.__read(path)
+
+                    if snapshot is not None:
+                        snapshots.append(snapshot)
+
+        return self.__merge_snapshots(snapshots)
+
+    def fold(self, pid):
+        '''
+        Adds the last samples written by exited worker pid into the aggregate file and deletes its file.
+        gunicorn's child_exit calls it from the master, before a new worker can get the same pid.
+        '''
+        if not settings.METRICS_DIR:
+            return
+
+        with self.__directory_lock(fcntl.LOCK_EX) as directory:
+            path     = directory / f'metrics-{pid}.json'
+            snapshot = self.__read(path)
+
+            if snapshot is None:
+                return
+
+            aggregate = self.__read(directory / self.AGGREGATE_FILE) or {}
+            merged    = self.__merge_snapshots([aggregate, snapshot])
+
+            self.__write(directory, self.AGGREGATE_FILE, {
+                name: [[list(labels), value] for labels, value in values.items()] for name, values in merged.items()
+            })
+            path.unlink()
+
+    def clear(self):
+        '''
+        Deletes every metrics file, so a new server does not add in the totals of an earlier run.
+        gunicorn's on_starting calls it before any worker is forked.
+        '''
+        if not settings.METRICS_DIR:
+            return
+
+        with self.__directory_lock(fcntl.LOCK_EX) as directory:
+            for path in directory.glob('*metrics-*.json*'):
+                path.unlink()
+
+    def exposition(self):
+        '''
+        All metrics in the Prometheus text format, version 0.0.4.
+        '''
+        merged = self.collect()
+        lines  = []
+
+        for name, metric in self.__metrics.items():
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+
+            for key, value in sorted(merged.get(name, {}).items()):
+                labels = list(zip(metric.labelnames, key))
+
+                if metric.kind == 'counter':
+                    lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+                    continue
+
+                counts, total = value
+                cumulative    = 0
+
+                for bucket, count in zip(metric.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{format_labels(labels + [("le", format_value(bucket))])} {cumulative}')
+
+                lines.append(f'{name}_sum{format_labels(labels)} {format_value(total)}')
+                lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+
+        return '\n'.join(lines) + '\n'
+
+    def __register(self, metric):
+        self.__metrics[metric.name] = metric
+
+        return metric
+
+    @contextmanager
+    def __directory_lock(self, operation):
+        '''
+        Lets collect() read while fold() and clear() move samples between files, never during.
+        '''
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        with open(directory / '.lock', 'a') as lock:
+            fcntl.flock(lock, operation)
+
+            try:
+                yield directory
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def __read(self, path):
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def __write(self, directory, name, snapshot):
+        temporary = directory / f'.{name}.{os.getpid()}.tmp'
+
+        temporary.write_text(json.dumps(snapshot))
+        os.replace(temporary, directory / name)
+
+    def __merge_snapshots(self, snapshots):
+        merged = {}
+
+        for snapshot in snapshots:
+            for name, samples in snapshot.items():
+                if name not in self.__metrics:
+                    continue
+
+                values = merged.setdefault(name, {})
+
+                for labels, value in samples:
+                    values[tuple(labels)] = self.__merge(self.__metrics[name], values.get(tuple(labels)), value)
+
+        return merged
+
+    def __merge(self, metric, current, value):
+        if current is None:
+            return value
+
+        if metric.kind == 'counter':
+            return current + value
+
+        return [[a + b for a, b in zip(current[0], value[0])], current[1] + value[1]]
+
+def format_labels(labels):
+    if not labels:
+        return ''
+
+    escape = lambda value: value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels) + '}'
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def exception_reason(message):
+    '''
+    Exception message usable as a label value, with list indexes dropped to keep the label set bounded.
+    '''
+    return re.sub(r'\[\d+\]', '[]', message)
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    'http_requests_total', 'Requests served, by view, method and status.', ['view', 'method', 'status']
+)
+http_request_duration_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Time spent serving a request, by view.', ['view']
+)
+db_query_duration_seconds = registry.histogram(
+    'db_query_duration_seconds', 'Time spent in database queries per request, by view.', ['view']
+)
+db_queries_total = registry.counter(
+    'db_queries_total', 'Database queries run, by view.', ['view']
+)
+exceptions_total = registry.counter(
+    'exceptions_total', 'Custom exceptions turned into error responses, by class and message.', ['exception', 'reason']
+)
+transaction_rejections_total = registry.counter(
+    'transaction_rejections_total', 'Deposits and withdrawals rejected by the ledger, by reason.', ['reason']
+)
+database_lock_retries_total = registry.counter(
+    'database_lock_retries_total', 'Write transactions started over because the database was locked.'
+)
+database_lock_failures_total = registry.counter(
+    'database_lock_failures_total', 'Write transactions that still found the database locked after the last retry.'
+)
+password_hash_queue_wait_seconds = registry.histogram(
+    'password_hash_queue_wait_seconds', 'Time bcrypt calls waited for a free password hasher thread.'
+)
+password_hash_rejections_total = registry.counter(
+    'password_hash_rejections_total', 'bcrypt calls refused with 503 because the password hasher queue was full.'
+)
+
+os.register_at_fork(after_in_child=registry.reset)
+atexit.register(registry.flush)
@@ -1,18 +1,111 @@
-from django.http import JsonResponse
+import json
+import time
+import asyncio
+import logging
 
-class ErrorResponseMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
+from django.http              import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
 
-    def __call__(self, request):
-        response = self.get_response(request)
+from apps.util.timing  import RequestTimings, current_timings
+from apps.util.metrics import registry, exception_reason, http_requests_total, http_request_duration_seconds, db_query_duration_seconds, db_queries_total, exceptions_total
 
-        return response
+logger = logging.getLogger('apps.request')
 
+class ErrorResponseMiddleware(MiddlewareMixin):
+    '''
+    MiddlewareMixin makes it sync and async capable, so an ASGI stack is not adapted to sync around it.
+    '''
     def process_exception(self, request, exception):
         try:
             if exception.is_custom:
+                exceptions_total.inc(exception = type(exception).__name__, reason = exception_reason(exception.message))
+
                 return JsonResponse({'message' : exception.message}, status=exception.status)
 
         except:
-            return JsonResponse({'message' : 'Server error'}, status=500)
\ No newline at end of file
+            return JsonResponse({'message' : 'Server error'}, status=500)
+
+class InstrumentationMiddleware:
+    '''
+    Measures total, DB, bcrypt and JWT time for each request.
+    The numbers go back in a Server-Timing header, to the apps.request logger as one JSON line
+    and into the request metrics of apps.util.metrics.
+    Runs sync or async, whichever get_response is, so an ASGI stack stays async.
+    '''
+    sync_capable  = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the instance as a coroutine function, the way MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall(request)
+
+        timings = RequestTimings()
+        token   = current_timings.set(timings)
+        started = time.perf_counter()
+
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+
+        return self.__finish(request, response, time.perf_counter() - started, timings)
+
+    async def __acall(self, request):
+        timings = RequestTimings()
+        token   = current_timings.set(timings)
+        started = time.perf_counter()
+
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+
+        return self.__finish(request, response, time.perf_counter() - started, timings)
+
+    def __finish(self, request, response, total, timings):
+        response['Server-Timing'] = self.__server_timing(total, timings)
+
+        logger.info(json.dumps({
+            'method'     : request.method,
+            'path'       : request.path,
+            'status'     : response.status_code,
+            'total_ms'   : round(total * 1000, 3),
+            'db_ms'      : round(timings.durations.get('db', 0) * 1000, 3),
+            'db_queries' : timings.counts.get('db', 0),
+            'bcrypt_ms'  : round(timings.durations.get('bcrypt', 0) * 1000, 3),
+            'jwt_ms'     : round(timings.durations.get('jwt', 0) * 1000, 3),
+        }))
+
+        self.__record_metrics(request, response, total, timings)
+
+        return response
+
+    def __record_metrics(self, request, response, total, timings):
+        view = request.resolver_match.view_name if request.resolver_match else 'unmatched'
+
+        http_requests_total.inc(view = view, method = request.method, status = response.status_code)
+        http_request_duration_seconds.observe(total, view = view)
+        db_query_duration_seconds.observe(timings.durations.get('db', 0), view = view)
+        db_queries_total.inc(timings.counts.get('db', 0), view = view)
+
+        registry.maybe_flush()
+
+    def __server_timing(self, total, timings):
+        metrics = [f'total;dur={total * 1000:.3f}']
+
+        for name, seconds in timings.durations.items():
+            metric = f'{name};dur={seconds * 1000:.3f}'
+
+            if name == 'db':
+                metric += f';desc="{timings.counts[name]} queries"'
+
+            metrics.append(metric)
+
+        return ', '.join(metrics)
\ No newline at end of file
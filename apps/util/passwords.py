@@ -0,0 +1,106 @@
+import os
+import time
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from django.conf import settings
+
+from apps.util.timing     import measure
+from apps.util.metrics    import password_hash_queue_wait_seconds, password_hash_rejections_total
+from apps.util.exceptions import ServiceUnavailableException
+
+def hash_rounds(hashed_password):
+    '''
+    Cost of a bcrypt hash, read from its $2b$<cost>$ prefix.
+    '''
+    return int(bytes(hashed_password)[4:6])
+
+def hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds))
+
+def verify_password(password, hashed_password, rounds):
+    '''
+    Checks password against hashed_password. Returns (is_valid, rehashed), where rehashed is
+    a new hash at rounds when the password is valid but was stored at another cost, else None.
+    '''
+    hashed_password = bytes(hashed_password)
+
+    if not bcrypt.checkpw(password.encode('utf-8'), hashed_password):
+        return False, None
+
+    if hash_rounds(hashed_password) == rounds:
+        return True, None
+
+    return True, hash_password(password, rounds)
+
+class PasswordHasher:
+    '''
+    Runs bcrypt on a pool of PASSWORD_HASHER_WORKERS threads shared by every request of the process.
+    bcrypt releases the GIL while hashing, so the pool spreads hashes over the cores while at most
+    that many run at once. Up to PASSWORD_HASHER_QUEUE_SIZE more wait for a free thread;
+    past that a request fails at once with ServiceUnavailableException instead of queueing.
+    The pool is created on first use, so each forked worker gets its own. A sync view's thread
+    still waits for its hash, so in a gthread worker the queue must be shorter than the thread count
+    for anything to be shed; gunicorn.conf.py sizes both that way. The async views await instead.
+    '''
+    def __init__(self):
+        self.__lock     = threading.Lock()
+        self.__executor = None
+        self.__slots    = None
+
+    def hash(self, password, rounds):
+        with measure('bcrypt'):
+            return self.__submit(hash_password, password, rounds).result()
+
+    def verify(self, password, hashed_password, rounds):
+        with measure('bcrypt'):
+            return self.__submit(verify_password, password, hashed_password, rounds).result()
+
+    async def ahash(self, password, rounds):
+        with measure('bcrypt'):
+            return await asyncio.wrap_future(self.__submit(hash_password, password, rounds))
+
+    async def averify(self, password, hashed_password, rounds):
+        with measure('bcrypt'):
+            return await asyncio.wrap_future(self.__submit(verify_password, password, hashed_password, rounds))
+
+    def reset(self):
+        self.__lock     = threading.Lock()
+        self.__executor = None
+        self.__slots    = None
+
+    def __submit(self, func, *args):
+        executor, slots = self.__pool()
+
+        if not slots.acquire(blocking=False):
+            password_hash_rejections_total.inc()
+            raise ServiceUnavailableException('Password hashing is overloaded')
+
+        submitted_at = time.perf_counter()
+
+        def run():
+            password_hash_queue_wait_seconds.observe(time.perf_counter() - submitted_at)
+
+            try:
+                return func(*args)
+            finally:
+                slots.release()
+
+        return executor.submit(run)
+
+    def __pool(self):
+        with self.__lock:
+            if self.__executor is None:
+                workers         = settings.PASSWORD_HASHER_WORKERS or os.cpu_count() or 1
+                self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hasher')
+                self.__slots    = threading.BoundedSemaphore(workers + settings.PASSWORD_HASHER_QUEUE_SIZE)
+
+            return self.__executor, self.__slots
+
+password_hasher = PasswordHasher()
+
+os.register_at_fork(after_in_child=password_hasher.reset)
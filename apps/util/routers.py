@@ -0,0 +1,83 @@
+import random
+import asyncio
+import functools
+import contextvars
+
+from django.conf        import settings
+from django.core.cache  import cache
+
+current_read_database = contextvars.ContextVar('current_read_database', default=None)
+
+class ReadReplicaRouter:
+    '''
+    Reads made inside a read_replica view go to the replica picked for the request,
+    every other read and every write goes to default.
+    Only default is migrated; replicas get their schema from replication.
+    '''
+    def db_for_read(self, model, **hints):
+        return current_read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+def written_key(user_id):
+    return f'read-your-writes:{user_id}'
+
+def record_write(user_id):
+    '''
+    Keeps the user's reads on default for READ_YOUR_WRITES_SECONDS, long enough for the replicas to catch up.
+    The mark lives in the default cache so every worker sharing that cache honours it.
+    '''
+    if settings.READ_REPLICAS and settings.READ_YOUR_WRITES_SECONDS:
+        cache.set(written_key(user_id), True, settings.READ_YOUR_WRITES_SECONDS)
+
+async def arecord_write(user_id):
+    if settings.READ_REPLICAS and settings.READ_YOUR_WRITES_SECONDS:
+        await cache.aset(written_key(user_id), True, settings.READ_YOUR_WRITES_SECONDS)
+
+def read_database(user_id):
+    if not settings.READ_REPLICAS or cache.get(written_key(user_id)):
+        return None
+
+    return random.choice(settings.READ_REPLICAS)
+
+async def aread_database(user_id):
+    if not settings.READ_REPLICAS or await cache.aget(written_key(user_id)):
+        return None
+
+    return random.choice(settings.READ_REPLICAS)
+
+def read_replica(func):
+    '''
+    Sends the ORM reads of a read-only view, sync or async, to a replica.
+    Apply it under validate_token so request.user is known.
+    Querysets evaluated after the view returns, like a streamed export, must be pinned with .using(queryset.db).
+    '''
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(self, request, *args, **kwargs):
+            token = current_read_database.set(await aread_database(request.user.id))
+
+            try:
+                return await func(self, request, *args, **kwargs)
+            finally:
+                current_read_database.reset(token)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(self, request, *args, **kwargs):
+        token = current_read_database.set(read_database(request.user.id))
+
+        try:
+            return func(self, request, *args, **kwargs)
+        finally:
+            current_read_database.reset(token)
+
+    return wrapper
@@ -0,0 +1,55 @@
+import json
+
+from datetime import datetime
+
+from django.utils import timezone
+
+from apps.util.transforms import TimeTransform
+
+def format_datetime(value):
+    '''
+    Same text as DjangoJSONEncoder: milliseconds at most and Z for UTC.
+    '''
+    result = value.isoformat()
+
+    if value.microsecond:
+        result = result[:23] + result[26:]
+
+    if result.endswith('+00:00'):
+        result = result[:-6] + 'Z'
+
+    return result
+
+class TransactionPageSerializer:
+    '''
+    Writes a page of transaction history as JSON text straight from values_list rows.
+    Rows are (amount, balance, summary, timestamp, is_withdrawal, ...) tuples with a microsecond unix timestamp;
+    anything after is_withdrawal is ignored. Timestamps get the tzinfo the same way
+    TimeTransform.make_aware does, with the current timezone looked up once per page.
+    The output is byte for byte what JsonResponse made from the equivalent dicts, without building
+    a model instance, a TimeTransform and a dict per row.
+    '''
+    columns = ('amount', 'balance', 'summary', 'timestamp', 'is_withdrawal')
+
+    def __init__(self, tz=None):
+        self.tz = tz or timezone.get_current_timezone()
+
+    def serialize(self, rows, **extra):
+        tz            = self.tz
+        dumps         = json.dumps
+        fromtimestamp = datetime.fromtimestamp
+        one_second    = TimeTransform.ONE_SECOND
+
+        transactions = ', '.join(
+            f'{{"amount": "{amount!s}", "balance": "{balance!s}", "summary": {dumps(summary)}, '
+            f'"timestamp": "{format_datetime(fromtimestamp(timestamp // one_second).replace(microsecond=timestamp % one_second, tzinfo=tz))}", '
+            f'"is_withdrawal": {"true" if is_withdrawal else "false"}}}'
+            for amount, balance, summary, timestamp, is_withdrawal, *_ in rows
+        )
+
+        result = f'{{"transactions": [{transactions}]'
+
+        for key, value in extra.items():
+            result += f', {dumps(key)}: {dumps(value)}'
+
+        return result + '}'
@@ -0,0 +1,70 @@
+import time
+import random
+import functools
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db   import connections, transaction, OperationalError
+
+from apps.util.metrics import database_lock_retries_total, database_lock_failures_total
+
+def configure_sqlite(sender, connection, **kwargs):
+    '''
+    connection_created receiver that applies SQLITE_PRAGMAS to every new SQLite connection.
+    '''
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+def is_lock_error(error):
+    return isinstance(error, OperationalError) and 'database is locked' in str(error)
+
+@contextmanager
+def immediate_atomic(using='default'):
+    '''
+    transaction.atomic that opens with BEGIN IMMEDIATE on the apps.util.backends.sqlite3 backend.
+    Nested blocks are savepoints as usual, and other backends get a plain atomic block.
+    '''
+    connection = connections[using]
+
+    connection.begin_immediate = not connection.in_atomic_block
+
+    try:
+        with transaction.atomic(using=using):
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
+
+def write_transaction(func):
+    '''
+    Runs func in an immediate_atomic block on default.
+    While the database is locked the whole block is retried up to DATABASE_LOCK_RETRIES times,
+    sleeping DATABASE_LOCK_BACKOFF seconds doubled on each attempt, with jitter.
+    Inside an outer atomic block nothing is retried, since only the outer block can start over.
+    '''
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        retries = 0 if connections['default'].in_atomic_block else settings.DATABASE_LOCK_RETRIES
+
+        for attempt in range(retries + 1):
+            try:
+                with immediate_atomic('default'):
+                    return func(*args, **kwargs)
+
+            except OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+
+                if attempt == retries:
+                    database_lock_failures_total.inc()
+                    raise
+
+            database_lock_retries_total.inc()
+            time.sleep(settings.DATABASE_LOCK_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    return wrapper
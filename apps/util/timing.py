@@ -0,0 +1,45 @@
+import time
+import contextvars
+
+from contextlib import contextmanager
+
+current_timings = contextvars.ContextVar('current_timings', default=None)
+
+class RequestTimings:
+    '''
+    Time spent per step while serving one request, in seconds.
+    '''
+    def __init__(self):
+        self.durations = {}
+        self.counts    = {}
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0) + seconds
+        self.counts[name]    = self.counts.get(name, 0) + 1
+
+@contextmanager
+def measure(name):
+    timings = current_timings.get()
+
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+def measure_queries(execute, sql, params, many, context):
+    '''
+    Execute wrapper installed on every database connection.
+    Does nothing outside of a request measured by InstrumentationMiddleware.
+    '''
+    with measure('db'):
+        return execute(sql, params, many, context)
+
+def install_query_timer(sender, connection, **kwargs):
+    if measure_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(measure_queries)
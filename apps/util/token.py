@@ -1,16 +1,93 @@
+import hmac
+import time
+import hashlib
+
 import jwt
 
+from django.conf import settings
 from django.http import JsonResponse
 
-from apps.auth.models        import User
+from apps.auth.models     import User
+from apps.util.caches     import user_cache
+from apps.util.timing     import measure
 from config.settings.base import SECRET_KEY
 
+def get_user(access_token, user_id):
+    if not settings.USER_CACHE_ENABLED:
+        return User.objects.get(id=user_id)
+
+    user = user_cache.get(access_token, user_id)
+
+    if user is None:
+        generation = user_cache.generation(user_id)
+        user       = User.objects.get(id=user_id)
+        user_cache.set(access_token, user_id, user, generation)
+
+    return user
+
+async def aget_user(access_token, user_id):
+    if not settings.USER_CACHE_ENABLED:
+        return await User.objects.aget(id=user_id)
+
+    user = user_cache.get(access_token, user_id)
+
+    if user is None:
+        generation = user_cache.generation(user_id)
+        user       = await User.objects.aget(id=user_id)
+        user_cache.set(access_token, user_id, user, generation)
+
+    return user
+
+def account_token_key():
+    '''
+    Account tokens are signed with a key derived from SECRET_KEY, so an access token can never pass for one.
+    '''
+    return hmac.new(SECRET_KEY.encode('utf-8'), b'account-authorization', hashlib.sha256).digest()
+
+def password_fingerprint(hashed_password):
+    '''
+    Short HMAC of the stored PIN hash. A token carrying it stops working once the PIN is changed or rehashed.
+    '''
+    return hmac.new(account_token_key(), bytes(hashed_password), hashlib.sha256).hexdigest()[:16]
+
+def issue_account_token(user_id, account_id, hashed_password):
+    '''
+    Signed HS256 token standing in for the account PIN of account_id for ACCOUNT_TOKEN_TTL seconds.
+    '''
+    payload = {
+        'user_id'    : user_id,
+        'account_id' : account_id,
+        'pin'        : password_fingerprint(hashed_password),
+        'exp'        : int(time.time()) + settings.ACCOUNT_TOKEN_TTL,
+    }
+
+    with measure('jwt'):
+        return jwt.encode(payload, account_token_key(), algorithm='HS256')
+
+def validate_account_token(account_token, user_id, account_id, hashed_password):
+    '''
+    True when account_token was issued to user_id for account_id with its current PIN and has not expired.
+    '''
+    try:
+        with measure('jwt'):
+            payload = jwt.decode(account_token, account_token_key(), algorithms=['HS256'])
+
+    except jwt.exceptions.InvalidTokenError:
+        return False
+
+    return (
+        payload.get('user_id') == user_id and payload.get('account_id') == account_id
+        and hmac.compare_digest(str(payload.get('pin')), password_fingerprint(hashed_password))
+    )
+
 def validate_token(func):
     def wrapper(self,request,*args,**kwargs):
         try:
             access_token = request.headers.get("Authorization",None)
-            payload = jwt.decode(access_token, SECRET_KEY, algorithms='HS256')
-            user = User.objects.get(id=payload['id'])
+            with measure('jwt'):
+                payload = jwt.decode(access_token, SECRET_KEY, algorithms='HS256')
+
+            user    = get_user(access_token, payload['id'])
             request.user = user  
             
             return func(self, request, *args, **kwargs)
@@ -21,4 +98,24 @@ def validate_token(func):
         except User.DoesNotExist:
             return JsonResponse({'message' : 'Invalid token'}, status=401)
 
+    return wrapper
+
+def async_validate_token(func):
+    async def wrapper(self,request,*args,**kwargs):
+        try:
+            access_token = request.headers.get("Authorization",None)
+            with measure('jwt'):
+                payload = jwt.decode(access_token, SECRET_KEY, algorithms='HS256')
+
+            user    = await aget_user(access_token, payload['id'])
+            request.user = user
+
+            return await func(self, request, *args, **kwargs)
+
+        except jwt.exceptions.DecodeError:
+            return JsonResponse({'message' : 'Invalid token'}, status=401)
+
+        except User.DoesNotExist:
+            return JsonResponse({'message' : 'Invalid token'}, status=401)
+
     return wrapper
\ No newline at end of file
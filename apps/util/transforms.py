@@ -1,13 +1,19 @@
 import re
+import json
+import base64
+import binascii
 
 from datetime               import datetime
 from dateutil.relativedelta import relativedelta
 
-from django.utils import timezone
+from django.db.models import Q, Value
+from django.utils     import timezone
 
 from apps.util.exceptions import BadRequestException
 
 class TimeTransform:
+    ONE_SECOND = 1000000
+
     def __init__(self, time='now', type='unix_time'):
         self.type = type
 
@@ -17,20 +23,28 @@ class TimeTransform:
             self.unix_time = datetime.strptime(time, "%Y-%m-%d").timestamp()
         elif type == 'unix_time':
             self.unix_time = time
+        elif type == 'micro_unix_time':
+            self.unix_time = time / self.ONE_SECOND
         elif type == 'datetime':
             self.unix_time = time.timestamp()
         else:
             raise TypeError('Unsupported type')
+
+        if type == 'micro_unix_time' and time != 'now':
+            self.micro_unix_time = time
+        else:
+            self.micro_unix_time = round(self.unix_time * self.ONE_SECOND)
     
     def make_aware(self):
-        return timezone.make_aware(datetime.fromtimestamp(self.unix_time))
+        seconds, microseconds = divmod(self.micro_unix_time, self.ONE_SECOND)
+        return timezone.make_aware(datetime.fromtimestamp(seconds).replace(microsecond=microseconds))
     
     def get_now(self, type='unix_time'):
         now = timezone.now().timestamp()
         if type == 'str_date':
             return datetime.fromtimestamp(now).strftime('%Y-%m-%d')
         elif type == 'int_unix_time':
-            return now * 1000000
+            return round(now * self.ONE_SECOND)
         elif type == 'unix_time':
             return now
         elif type == 'datetime':
@@ -38,8 +52,48 @@ class TimeTransform:
         else:
             raise TypeError('Unsupported type')
 
+class CursorTransform:
+    '''
+    Opaque keyset cursor holding the (timestamp in microseconds, id) of the last row of a page.
+    An empty cursor points before the first row.
+    '''
+    def __init__(self, cursor=''):
+        self.timestamp = None
+        self.id        = None
+
+        if cursor:
+            self.__decode(cursor)
+
+    @classmethod
+    def encode(cls, timestamp, id):
+        raw = json.dumps([timestamp, id], separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def __decode(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            raw     = base64.urlsafe_b64decode(cursor + padding)
+            timestamp, id = json.loads(raw)
+        except (binascii.Error, ValueError, TypeError):
+            raise BadRequestException('Invalid cursor')
+
+        if type(timestamp) != int or type(id) != int:
+            raise BadRequestException('Invalid cursor')
+
+        self.timestamp = timestamp
+        self.id        = id
+
+    def get_tie_breaker(self, is_descending):
+        if self.id is None:
+            return Q()
+
+        if is_descending:
+            return Q(timestamp__lt=self.timestamp) | Q(id__lt=self.id)
+
+        return Q(timestamp__gt=self.timestamp) | Q(id__gt=self.id)
+
 class GetTransactionsQueryTransform:
-    __order_set        = {'recent' : '-timestamp', 'oldest' : 'timestamp'}
+    __order_set        = {'recent' : ('-timestamp', '-id'), 'oldest' : ('timestamp', 'id')}
     __transaction_type = ['deposit', 'withdrawal', 'all']
     
     def __init__(self, query):
@@ -49,9 +103,37 @@ class GetTransactionsQueryTransform:
         self.offset           = query.get('offset', '0')
         self.limit            = query.get('limit', '10')
         self.transaction_type = query.get('transaction-type', 'all')
+        self.cursor           = query.get('cursor')
 
         self.translate()
 
+    def cache_key(self):
+        '''
+        The parameters after defaults and validation, so equivalent requests share a key.
+        '''
+        cursor = '' if self.cursor is None else f'{self.cursor.timestamp}.{self.cursor.id}'
+
+        return f'{self.start_date}:{self.end_date}:{self.order_by[0]}:{self.transaction_type}:{self.offset}:{self.limit}:{cursor}'
+
+    def is_closed(self):
+        '''
+        True when the whole date range is in the past, so no new transaction can fall in it.
+        Checks the end date as requested, since a descending cursor narrows end_date to its own timestamp.
+        '''
+        return self.requested_end_date <= TimeTransform().get_now('int_unix_time')
+
+    def get_filter(self, account_id):
+        q = Q(account_id=account_id)
+
+        q &= Q(timestamp__gte=self.start_date) & Q(timestamp__lte=self.end_date)
+
+        # Value keeps this an equality; a bare boolean renders as (NOT) is_withdrawal,
+        # which SQLite cannot match against the (account, is_withdrawal, timestamp, id) index.
+        if self.transaction_type != 'all':
+            q &= Q(is_withdrawal = Value(self.transaction_type == 'withdrawal'))
+
+        return q
+
     def translate(self):
         self.__set_offset()
         self.__set_limit()
@@ -59,6 +141,7 @@ class GetTransactionsQueryTransform:
         self.__validate_transaction_type()
         self.__set_start_date()
         self.__set_end_date()
+        self.__set_cursor()
 
     def __set_offset(self):
         OFFSEET_REGEX = '\d'
@@ -81,6 +164,8 @@ class GetTransactionsQueryTransform:
         except KeyError:
             raise BadRequestException('Invalid order key')
 
+        self.is_descending = self.order_by[0].startswith('-')
+
     def __validate_transaction_type(self):
         if self.transaction_type not in self.__transaction_type:
             raise BadRequestException('Invalid transaction type')
@@ -93,7 +178,7 @@ class GetTransactionsQueryTransform:
         if not re.fullmatch(DATE_REGEX, self.start_date):
             raise BadRequestException('Invalid start date')
             
-        self.start_date = TimeTransform(self.start_date, 'str_date').unix_time
+        self.start_date = TimeTransform(self.start_date, 'str_date').micro_unix_time
             
     def __set_end_date(self):
         DATE_REGEX = '(19|20)\d{2}-(0[1-9]|1[012])-(0[1-9]|[12][0-9]|3[01])'
@@ -103,5 +188,84 @@ class GetTransactionsQueryTransform:
 
         if not re.fullmatch(DATE_REGEX, self.end_date):
             raise BadRequestException('Invalid end date')
-        ONE_DAY = 86400
-        self.end_date = TimeTransform(self.end_date, 'str_date').unix_time + ONE_DAY
\ No newline at end of file
+        ONE_DAY = 86400 * TimeTransform.ONE_SECOND
+        self.end_date = TimeTransform(self.end_date, 'str_date').micro_unix_time + ONE_DAY
+
+        self.requested_end_date = self.end_date
+
+    def __set_cursor(self):
+        '''
+        Without a cursor the request pages by offset. With one, the date range is
+        narrowed to the cursor position so the index scan starts right there.
+        '''
+        if self.cursor is None:
+            return
+
+        self.cursor = CursorTransform(self.cursor)
+
+        if self.cursor.id is None:
+            return
+
+        if self.is_descending:
+            self.end_date = min(self.end_date, self.cursor.timestamp)
+        else:
+            self.start_date = max(self.start_date, self.cursor.timestamp)
+
+class GetSummaryQueryTransform:
+    def __init__(self, query):
+        self.start_date = query.get('start-date')
+        self.end_date   = query.get('end-date')
+
+        self.translate()
+
+    def cache_key(self):
+        return f'{self.start_date}:{self.end_date}'
+
+    def is_closed(self):
+        return self.end_date < TimeTransform().get_now('datetime').date()
+
+    def translate(self):
+        self.__set_start_date()
+        self.__set_end_date()
+
+    def __set_start_date(self):
+        DATE_REGEX = '(19|20)\d{2}-(0[1-9]|1[012])-(0[1-9]|[12][0-9]|3[01])'
+        if not self.start_date:
+            self.start_date = (TimeTransform().get_now('datetime') - relativedelta(months=3)).strftime('%Y-%m-%d')
+
+        if not re.fullmatch(DATE_REGEX, self.start_date):
+            raise BadRequestException('Invalid start date')
+
+        self.start_date = datetime.strptime(self.start_date, '%Y-%m-%d').date()
+
+    def __set_end_date(self):
+        DATE_REGEX = '(19|20)\d{2}-(0[1-9]|1[012])-(0[1-9]|[12][0-9]|3[01])'
+        if not self.end_date:
+            self.end_date = TimeTransform().get_now('str_date')
+
+        if not re.fullmatch(DATE_REGEX, self.end_date):
+            raise BadRequestException('Invalid end date')
+
+        self.end_date = datetime.strptime(self.end_date, '%Y-%m-%d').date()
+
+class ExportTransactionsQueryTransform(GetTransactionsQueryTransform):
+    '''
+    The export streams the whole date range, so offset, limit and cursor are dropped
+    instead of being validated or narrowing the range.
+    '''
+    __formats = ['csv', 'ndjson']
+    __paging  = ['offset', 'limit', 'cursor']
+
+    def __init__(self, query):
+        self.format = query.get('format', 'csv')
+
+        super().__init__({key : value for key, value in query.items() if key not in self.__paging})
+
+    def cache_key(self):
+        return f'{super().cache_key()}:{self.format}'
+
+    def translate(self):
+        super().translate()
+
+        if self.format not in self.__formats:
+            raise BadRequestException('Invalid format')
\ No newline at end of file
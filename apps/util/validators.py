@@ -5,9 +5,10 @@ from apps.util.exceptions import AuthException, BadRequestException
 
 class PostTransactionsJsonValidator:
     def __init__(self, body_json):
-        data = json.loads(body_json)
+        data = json.loads(body_json) if isinstance(body_json, (str, bytes)) else body_json
 
         self.password      = data.get('password', '')
+        self.account_token = data.get('account_token', '')
         self.summary       = data.get('summary', '')
         self.amount        = data.get('amount', '')
         self.is_withdrawal = data.get('is_withdrawal', '')
@@ -22,7 +23,12 @@ class PostTransactionsJsonValidator:
 
     def __validate_password(self):
         PASSWORD_REGEX = '\d{4}'
-        
+
+        if self.account_token:
+            if type(self.account_token) != str:
+                raise AuthException('Invalid account token')
+            return
+
         if not re.fullmatch(PASSWORD_REGEX, self.password):
             raise AuthException('Invalid password')            
 
@@ -40,4 +46,77 @@ class PostTransactionsJsonValidator:
         if not re.fullmatch(AMOUNT_REGEX,self.amount):
             raise BadRequestException('Invalid amount')
 
-        self.amount = int(self.amount)
\ No newline at end of file
+        self.amount = int(self.amount)
+
+class PostAccountAuthorizationJsonValidator:
+    def __init__(self, body_json):
+        data = json.loads(body_json)
+
+        self.password = data.get('password', '') if type(data) == dict else ''
+
+        self.__validate()
+
+    def __validate(self):
+        PASSWORD_REGEX = '\d{4}'
+
+        if type(self.password) != str or not re.fullmatch(PASSWORD_REGEX, self.password):
+            raise AuthException('Invalid password')
+
+class PostTransactionsBatchJsonValidator:
+    '''
+    body = {
+        accounts: [
+            {
+                account_id: int,
+                password: str,
+                transactions: [{summary: str, amount: str, is_withdrawal: boolean}]
+            }
+        ]
+    }
+    '''
+    def __init__(self, body_json, max_items):
+        data = json.loads(body_json)
+
+        self.accounts  = data.get('accounts', '') if type(data) == dict else ''
+        self.max_items = max_items
+
+        self.__validate()
+
+    def __validate(self):
+        if type(self.accounts) != list or not self.accounts:
+            raise BadRequestException('Invalid accounts')
+
+        self.accounts = [self.__validate_account(account) for account in self.accounts]
+
+        account_ids = [account['account_id'] for account in self.accounts]
+
+        if len(set(account_ids)) != len(account_ids):
+            raise BadRequestException('Duplicate account id')
+
+        if sum(len(account['transactions']) for account in self.accounts) > self.max_items:
+            raise BadRequestException('Too many transactions')
+
+    def __validate_account(self, account):
+        if type(account) != dict:
+            raise BadRequestException('Invalid accounts')
+
+        account_id   = account.get('account_id')
+        password     = account.get('password', '')
+        transactions = account.get('transactions')
+
+        if type(account_id) != int or account_id < 1:
+            raise BadRequestException('Invalid account id')
+
+        if type(transactions) != list or not transactions:
+            raise BadRequestException('Invalid transactions')
+
+        if any(type(transaction) != dict for transaction in transactions):
+            raise BadRequestException('Invalid transactions')
+
+        return {
+            'account_id'   : account_id,
+            'password'     : password,
+            'transactions' : [
+                PostTransactionsJsonValidator({**transaction, 'password': password, 'account_token': ''}) for transaction in transactions
+            ]
+        }
\ No newline at end of file
@@ -0,0 +1,19 @@
+from django.conf  import settings
+from django.views import View
+from django.http  import HttpResponse
+
+from apps.util.metrics    import registry
+from apps.util.exceptions import PermissionException
+
+class MetricsView(View):
+    '''
+    Metrics of every worker in the Prometheus text format.
+    Only answered for the addresses in METRICS_ALLOWED_IPS.
+    '''
+    def get(self, request):
+        if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+            raise PermissionException('Dont have permission')
+
+        registry.flush()
+
+        return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
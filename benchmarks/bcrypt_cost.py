@@ -0,0 +1,57 @@
+'''
+bcrypt checkpw time per cost on this host, to pick BCRYPT_LOGIN_ROUNDS and BCRYPT_PIN_ROUNDS.
+
+Each cost doubles the work of the previous one. Pick the highest cost whose time still fits
+the latency budget of the endpoint: signin for login passwords, every deposit and withdrawal for PINs.
+
+    python -m benchmarks.bcrypt_cost --min-rounds 4 --max-rounds 14 --repeat 5
+'''
+import time
+import argparse
+import statistics
+
+import bcrypt
+
+from benchmarks.common import write_results
+
+def measure(rounds, repeat):
+    password        = b'1234'
+    hashed_password = bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+    timings         = []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        bcrypt.checkpw(password, hashed_password)
+        timings.append(time.perf_counter() - started)
+
+    return {
+        'median_ms' : round(statistics.median(timings) * 1000, 3),
+        'min_ms'    : round(min(timings) * 1000, 3),
+        'max_ms'    : round(max(timings) * 1000, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-rounds', type=int, default=4)
+    parser.add_argument('--max-rounds', type=int, default=14)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='result JSON path, defaults to benchmarks/results/')
+    args = parser.parse_args()
+
+    results = {}
+
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        results[rounds] = measure(rounds, args.repeat)
+
+        print(f'cost {rounds:>2}  median {results[rounds]["median_ms"]:>10} ms  '
+              f'min {results[rounds]["min_ms"]:>10} ms  max {results[rounds]["max_ms"]:>10} ms')
+
+    output = write_results('bcrypt_cost', {
+        'parameters' : {'min_rounds': args.min_rounds, 'max_rounds': args.max_rounds, 'repeat': args.repeat},
+        'costs'      : results,
+    }, args.output)
+
+    print(f'results saved to {output}')
+
+if __name__ == '__main__':
+    main()
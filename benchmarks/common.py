@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import time
+import subprocess
+
+from pathlib import Path
+
+BASE_DIR    = Path(__file__).resolve().parent.parent
+RESULTS_DIR = BASE_DIR / 'benchmarks' / 'results'
+
+def setup_django(settings_module='config.settings.benchmark'):
+    sys.path.insert(0, str(BASE_DIR))
+
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+
+    import django
+    django.setup()
+
+def percentile(sorted_values, rank):
+    '''
+    Nearest-rank percentile of an already sorted list.
+    '''
+    if not sorted_values:
+        return None
+
+    index = max(0, min(len(sorted_values) - 1, int(round(rank / 100 * len(sorted_values))) - 1))
+
+    return sorted_values[index]
+
+def summarize_latencies(latencies, elapsed, errors):
+    latencies = sorted(latencies)
+    to_ms     = lambda value: round(value * 1000, 3) if value is not None else None
+
+    return {
+        'requests'            : len(latencies) + errors,
+        'errors'              : errors,
+        'requests_per_second' : round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms'              : to_ms(percentile(latencies, 50)),
+        'p95_ms'              : to_ms(percentile(latencies, 95)),
+        'p99_ms'              : to_ms(percentile(latencies, 99)),
+        'max_ms'              : to_ms(latencies[-1] if latencies else None),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def write_results(name, results, output=None):
+    '''
+    Saves results as JSON tagged with the current commit so runs can be diffed across commits.
+    '''
+    commit  = git_commit()
+    payload = {
+        'benchmark' : name,
+        'commit'    : commit,
+        'timestamp' : time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python'    : sys.version.split()[0],
+        **results
+    }
+
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        output = RESULTS_DIR / f'{name}-{commit}-{time.strftime("%Y%m%d%H%M%S")}.json'
+
+    Path(output).write_text(json.dumps(payload, indent=2, ensure_ascii=False))
+
+    return output
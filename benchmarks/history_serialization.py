@@ -0,0 +1,101 @@
+'''
+Transaction history page building: model instances versus the values_list projection.
+
+Seeds one account, then builds the same page both ways in-process, without HTTP,
+and reports the time and peak Python memory of each. Database time is included in both.
+
+    python -m benchmarks.history_serialization --limit 5000 --repeat 20
+'''
+import time
+import argparse
+import tracemalloc
+
+from benchmarks.common    import setup_django, write_results
+from benchmarks.http_load import seed
+
+def model_page(account_id, limit):
+    from django.http import JsonResponse
+
+    from apps.transaction.models import Transaction
+    from apps.util.transforms    import TimeTransform
+
+    transaction_rows = Transaction.objects.filter(account_id = account_id).order_by('-timestamp', '-id')[:limit]
+    result           = [
+        {
+            'amount'        : transaction.amount,
+            'balance'       : transaction.balance,
+            'summary'       : transaction.summary,
+            'timestamp'     : TimeTransform(transaction.timestamp, 'micro_unix_time').make_aware(),
+            'is_withdrawal' : transaction.is_withdrawal
+        } for transaction in transaction_rows
+    ]
+
+    return JsonResponse({'transactions':result}).content
+
+def projection_page(account_id, limit):
+    from django.http import QueryDict
+
+    from apps.transaction.views import filter_transactions, transactions_page
+    from apps.util.transforms   import GetTransactionsQueryTransform
+
+    query = GetTransactionsQueryTransform(QueryDict(f'limit={limit}&start-date=2000-01-01'))
+
+    return transactions_page(list(filter_transactions(account_id, query)[0]), query).encode()
+
+def measure(build, account_id, limit, repeat):
+    build(account_id, limit)
+
+    started = time.perf_counter()
+
+    for _ in range(repeat):
+        build(account_id, limit)
+
+    elapsed = (time.perf_counter() - started) / repeat
+
+    tracemalloc.start()
+    build(account_id, limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ms_per_page'     : round(elapsed * 1000, 3),
+        'us_per_row'      : round(elapsed / limit * 1000000, 3),
+        'peak_memory_kib' : round(peak / 1024, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--settings', default='config.settings.benchmark')
+    parser.add_argument('--limit', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='result JSON path, defaults to benchmarks/results/')
+    args = parser.parse_args()
+
+    setup_django(args.settings)
+
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+
+    account_id, _, _ = seed(1, args.limit, args.seed)[0]
+    limit            = args.limit
+    results          = {
+        'model'      : measure(model_page, account_id, limit, args.repeat),
+        'projection' : measure(projection_page, account_id, limit, args.repeat),
+    }
+
+    for name, result in results.items():
+        print(f'{name:<12} {result["ms_per_page"]:>9} ms/page  {result["us_per_row"]:>7} us/row  '
+              f'peak {result["peak_memory_kib"]} KiB')
+
+    output = write_results('history_serialization', {
+        'settings'   : args.settings,
+        'parameters' : {'limit': limit, 'repeat': args.repeat, 'seed': args.seed},
+        'paths'      : results,
+    }, args.output)
+
+    print(f'results saved to {output}')
+
+if __name__ == '__main__':
+    main()
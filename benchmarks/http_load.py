@@ -0,0 +1,195 @@
+'''
+End-to-end HTTP load benchmark.
+
+Seeds a throwaway database, serves config.wsgi's application on a local threaded
+WSGI server and drives every scenario at the given concurrency.
+Requests per second and p50/p95/p99 latency per scenario are printed and saved as JSON.
+
+    python -m benchmarks.http_load --concurrency 8 --requests 500
+'''
+import json
+import time
+import random
+import argparse
+import threading
+import http.client
+
+from concurrent.futures    import ThreadPoolExecutor
+from socketserver          import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+from benchmarks.common import setup_django, summarize_latencies, write_results
+
+PASSWORD = '1234'
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads     = True
+    request_queue_size = 1024
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+def seed(users, transactions_per_account, seed_value):
+    '''
+    One account per user, each with a chained history spread over the last year,
+    written by the generate_dataset command. Returns (account_id, user_id, username) per account.
+    '''
+    import io
+
+    from django.core.management import call_command
+
+    from apps.transaction.models import Account
+
+    call_command(
+        'generate_dataset',
+        users                    = users,
+        transactions_per_account = transactions_per_account,
+        seed                     = seed_value,
+        username_prefix          = 'bench',
+        password                 = PASSWORD,
+        flush                    = True,
+        stdout                   = io.StringIO()
+    )
+
+    return list(Account.objects.order_by('id').values_list('id', 'user_id', 'user__username'))
+
+def build_scenarios(accounts):
+    import jwt
+
+    from config.settings.base import SECRET_KEY
+
+    tokens = {user_id: jwt.encode({'id': user_id}, SECRET_KEY) for _, user_id, _ in accounts}
+
+    def post_transaction(is_withdrawal):
+        def request(rng):
+            account_id, user_id, _ = rng.choice(accounts)
+            body = {'password': PASSWORD, 'amount': '1000', 'is_withdrawal': is_withdrawal}
+            return 'POST', f'/accounts/{account_id}/transactions', body, tokens[user_id]
+        return request
+
+    def get_history(query):
+        def request(rng):
+            account_id, user_id, _ = rng.choice(accounts)
+            return 'GET', f'/accounts/{account_id}/transactions{query}', None, tokens[user_id]
+        return request
+
+    def signin(rng):
+        _, _, username = rng.choice(accounts)
+        body = {'username': username, 'password': PASSWORD}
+        return 'POST', '/auth/users/signin', body, None
+
+    return {
+        'deposit'                 : post_transaction(False),
+        'withdrawal'              : post_transaction(True),
+        'history_default'         : get_history(''),
+        'history_limit_100'       : get_history('?limit=100'),
+        'history_withdrawal_only' : get_history('?transaction-type=withdrawal&start-date=2000-01-01'),
+        'history_oldest_year'     : get_history('?order-key=oldest&start-date=2000-01-01&limit=50'),
+        'history_cursor'          : get_history('?cursor=&start-date=2000-01-01&limit=50'),
+        'signin'                  : signin,
+    }
+
+def send(host, port, method, path, body, token):
+    headers = {'Content-Type': 'application/json'}
+
+    if token:
+        headers['Authorization'] = token
+
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+
+    try:
+        started = time.perf_counter()
+        connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+        response = connection.getresponse()
+        response.read()
+        elapsed = time.perf_counter() - started
+    finally:
+        connection.close()
+
+    return response.status, elapsed
+
+def run_scenario(host, port, make_request, requests, concurrency, seed_value):
+    rng_lock = threading.Lock()
+    rng      = random.Random(seed_value)
+
+    def one(_):
+        with rng_lock:
+            method, path, body, token = make_request(rng)
+
+        try:
+            status, elapsed = send(host, port, method, path, body, token)
+        except OSError:
+            return None
+
+        return elapsed if status < 400 else None
+
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(one, range(requests)))
+
+    elapsed   = time.perf_counter() - started
+    latencies = [outcome for outcome in outcomes if outcome is not None]
+
+    return summarize_latencies(latencies, elapsed, len(outcomes) - len(latencies))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--settings', default='config.settings.benchmark')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--transactions-per-account', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500, help='requests per scenario')
+    parser.add_argument('--scenarios', nargs='*', help='run only these scenarios')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='result JSON path, defaults to benchmarks/results/')
+    args = parser.parse_args()
+
+    setup_django(args.settings)
+
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+
+    accounts  = seed(args.users, args.transactions_per_account, args.seed)
+    scenarios = build_scenarios(accounts)
+
+    from config.wsgi import application
+
+    server = make_server('127.0.0.1', 0, application, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    host, port = server.server_address
+    results    = {}
+
+    try:
+        for name, make_request in scenarios.items():
+            if args.scenarios and name not in args.scenarios:
+                continue
+
+            results[name] = run_scenario(host, port, make_request, args.requests, args.concurrency, args.seed)
+
+            print(f'{name:<24} {results[name]["requests_per_second"]:>9} req/s  '
+                  f'p50 {results[name]["p50_ms"]} ms  p95 {results[name]["p95_ms"]} ms  '
+                  f'p99 {results[name]["p99_ms"]} ms  errors {results[name]["errors"]}')
+    finally:
+        server.shutdown()
+
+    output = write_results('http_load', {
+        'settings'   : args.settings,
+        'parameters' : {
+            'users'                    : args.users,
+            'transactions_per_account' : args.transactions_per_account,
+            'concurrency'              : args.concurrency,
+            'requests'                 : args.requests,
+            'seed'                     : args.seed,
+        },
+        'scenarios'  : results,
+    }, args.output)
+
+    print(f'results saved to {output}')
+
+if __name__ == '__main__':
+    main()
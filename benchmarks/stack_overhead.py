@@ -0,0 +1,115 @@
+'''
+Startup and per-request cost of the full middleware and app stack versus the lean API stack.
+
+Each settings module is measured in fresh processes, the way a worker starts:
+the time to import Django and build the WSGI application, the first request,
+the resident memory once warm and the mean time of a request that only passes
+through the stack. That request is an unauthenticated history read, answered 401
+by validate_token before any query, so what is left is the middleware chain.
+
+    python -m benchmarks.stack_overhead --processes 5 --requests 5000
+'''
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+from benchmarks.common import BASE_DIR, setup_django, write_results
+
+STACKS = {
+    'full' : 'config.settings.benchmark',
+    'api'  : 'config.settings.benchmark_api',
+}
+
+def resident_memory_kib():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+    return None
+
+def call(application, path):
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET', 'REMOTE_ADDR': '127.0.0.1'}
+    setup_testing_defaults(environ)
+
+    response = application(environ, lambda status, headers: None)
+    b''.join(response)
+    response.close()
+
+def child(settings_module, requests):
+    '''
+    Runs in its own process and prints one JSON line.
+    '''
+    started = time.perf_counter()
+
+    setup_django(settings_module)
+
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+    imported    = time.perf_counter()
+
+    call(application, '/accounts/1/transactions')
+    first_request = time.perf_counter()
+
+    for _ in range(100):
+        call(application, '/accounts/1/transactions')
+
+    loop_started = time.perf_counter()
+
+    for _ in range(requests):
+        call(application, '/accounts/1/transactions')
+
+    elapsed = time.perf_counter() - loop_started
+
+    print(json.dumps({
+        'import_ms'        : (imported - started) * 1000,
+        'first_request_ms' : (first_request - imported) * 1000,
+        'request_us'       : elapsed / requests * 1000000,
+        'rss_kib'          : resident_memory_kib(),
+    }))
+
+def measure(settings_module, processes, requests):
+    runs = []
+
+    for _ in range(processes):
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.stack_overhead', '--child', settings_module, '--requests', str(requests)],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout
+
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {key: round(statistics.median(run[key] for run in runs), 3) for key in runs[0]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=5, help='fresh processes per stack, medians are reported')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--child', metavar='SETTINGS', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help='result JSON path, defaults to benchmarks/results/')
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.requests)
+
+    results = {name: measure(settings_module, args.processes, args.requests) for name, settings_module in STACKS.items()}
+
+    for name, result in results.items():
+        print(f'{name:<5} import {result["import_ms"]:>8} ms  first request {result["first_request_ms"]:>8} ms  '
+              f'request {result["request_us"]:>8} us  rss {result["rss_kib"]} KiB')
+
+    output = write_results('stack_overhead', {
+        'parameters' : {'processes': args.processes, 'requests': args.requests},
+        'stacks'     : {name: {'settings': STACKS[name], **results[name]} for name in STACKS},
+    }, args.output)
+
+    print(f'results saved to {output}')
+
+if __name__ == '__main__':
+    main()
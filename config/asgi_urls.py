@@ -0,0 +1,9 @@
+from django.urls import path, include
+
+from apps.util.views import MetricsView
+
+urlpatterns = [
+    path('auth', include('apps.auth.async_urls')),
+    path('accounts', include('apps.transaction.async_urls')),
+    path('internal/metrics', MetricsView.as_view())
+]
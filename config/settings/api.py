@@ -0,0 +1,5 @@
+from .production import *
+
+# production without the browser apps and middleware, for processes that only serve the JSON API.
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in BROWSER_APPS]
+MIDDLEWARE     = [middleware for middleware in MIDDLEWARE if middleware not in BROWSER_MIDDLEWARE]
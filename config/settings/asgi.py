@@ -0,0 +1,7 @@
+from .api import *
+
+# Async views for the transaction and auth endpoints, served by uvicorn workers under gunicorn
+# on the lean API stack.
+ROOT_URLCONF = 'config.asgi_urls'
+
+ASGI_APPLICATION = 'config.asgi.application'
@@ -22,6 +22,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.util.middlewares.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -33,6 +34,15 @@ MIDDLEWARE = [
     'apps.util.middlewares.ErrorResponseMiddleware'
 ]
 
+# Parts of the stack only browser-facing pages use. The JWT JSON API never reads a session,
+# a flash message or a static file and is not framed, so config.settings.api leaves them out.
+BROWSER_APPS       = ['django.contrib.sessions', 'django.contrib.messages', 'django.contrib.staticfiles']
+BROWSER_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
 ROOT_URLCONF = 'config.urls'
 
 WSGI_APPLICATION = 'config.wsgi.application'
@@ -52,6 +62,95 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 APPEND_SLASH = False
 
 SECRET_KEY = os.environ.get('SECRET_KEY')
+
+# Coalesce concurrent deposits and withdrawals to the same account into one database transaction.
+TRANSACTION_GROUP_COMMIT        = os.environ.get('TRANSACTION_GROUP_COMMIT', 'False') == 'True'
+TRANSACTION_GROUP_COMMIT_LINGER = float(os.environ.get('TRANSACTION_GROUP_COMMIT_LINGER', '0'))
+
+TRANSACTION_BATCH_MAX_ITEMS = int(os.environ.get('TRANSACTION_BATCH_MAX_ITEMS', '1000'))
+
+# Transactions older than this are moved to archived_transactions by the archive_transactions command.
+TRANSACTION_ARCHIVE_AFTER_DAYS = int(os.environ.get('TRANSACTION_ARCHIVE_AFTER_DAYS', '365'))
+TRANSACTION_ARCHIVE_BATCH_SIZE = int(os.environ.get('TRANSACTION_ARCHIVE_BATCH_SIZE', '1000'))
+
+# PRAGMAs set on every new SQLite connection. WAL lets reads run next to the single writer,
+# busy_timeout makes a writer wait for the lock instead of failing, and wal_autocheckpoint with
+# journal_size_limit keep the WAL file from growing without bound. SQLITE_TUNING=False keeps SQLite's defaults.
+SQLITE_PRAGMAS = {
+    'journal_mode'       : os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous'        : os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout'       : int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'mmap_size'          : int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    'cache_size'         : int(os.environ.get('SQLITE_CACHE_SIZE', '-65536')),
+    'temp_store'         : 'MEMORY',
+    'wal_autocheckpoint' : int(os.environ.get('SQLITE_WAL_AUTOCHECKPOINT', '1000')),
+    'journal_size_limit' : int(os.environ.get('SQLITE_JOURNAL_SIZE_LIMIT', str(64 * 1024 * 1024))),
+} if os.environ.get('SQLITE_TUNING', 'True') == 'True' else {}
+
+# Write transactions that still find the database locked after busy_timeout are started over.
+DATABASE_LOCK_RETRIES = int(os.environ.get('DATABASE_LOCK_RETRIES', '3'))
+DATABASE_LOCK_BACKOFF = float(os.environ.get('DATABASE_LOCK_BACKOFF', '0.05'))
+
+# bcrypt runs on a shared pool of this many threads per process, 0 for one per CPU. Past
+# PASSWORD_HASHER_QUEUE_SIZE waiting calls, requests needing a hash are refused with 503.
+# gunicorn.conf.py sets both from the worker and thread counts, so the pools of all workers share the cores.
+PASSWORD_HASHER_WORKERS    = int(os.environ.get('PASSWORD_HASHER_WORKERS', '0'))
+PASSWORD_HASHER_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASHER_QUEUE_SIZE', '32'))
+
+# bcrypt cost of login passwords and of account PINs, which are checked on every transaction.
+# A password stored at another cost is rehashed at this one on its next successful check.
+BCRYPT_LOGIN_ROUNDS = int(os.environ.get('BCRYPT_LOGIN_ROUNDS', '12'))
+BCRYPT_PIN_ROUNDS   = int(os.environ.get('BCRYPT_PIN_ROUNDS', '12'))
+
+# Lifetime of the account tokens that stand in for the account PIN on deposits and withdrawals.
+ACCOUNT_TOKEN_TTL = int(os.environ.get('ACCOUNT_TOKEN_TTL', '120'))
+
+# Responses to transaction POSTs sent with an Idempotency-Key header are replayed to retries for
+# IDEMPOTENCY_KEY_TTL seconds, then removed by purge_idempotency_keys in batches of IDEMPOTENCY_PURGE_BATCH_SIZE.
+# A key whose request is still running is held for IDEMPOTENCY_CLAIM_TIMEOUT seconds, longer than the gunicorn
+# worker timeout, so a key left behind by a killed worker whose write never committed can be retried.
+IDEMPOTENCY_KEY_TTL          = int(os.environ.get('IDEMPOTENCY_KEY_TTL', str(24 * 60 * 60)))
+IDEMPOTENCY_CLAIM_TIMEOUT    = int(os.environ.get('IDEMPOTENCY_CLAIM_TIMEOUT', '60'))
+IDEMPOTENCY_PURGE_BATCH_SIZE = int(os.environ.get('IDEMPOTENCY_PURGE_BATCH_SIZE', '1000'))
+
+# Transaction history pages are cached in the history cache under the account's history_version,
+# which every write bumps. locmem is per process; point HISTORY_CACHE_BACKEND at a shared backend,
+# e.g. django.core.cache.backends.redis.RedisCache, when several workers serve the api.
+HISTORY_CACHE_ENABLED = os.environ.get('HISTORY_CACHE_ENABLED', 'False') == 'True'
+HISTORY_CACHE_TTL     = int(os.environ.get('HISTORY_CACHE_TTL', '300'))
+
+# History responses for a date range that is already over never change; clients may keep them this long.
+CLOSED_HISTORY_MAX_AGE = int(os.environ.get('CLOSED_HISTORY_MAX_AGE', str(365 * 24 * 60 * 60)))
+
+# The default cache holds the read-your-writes marks of the replica router. With READ_REPLICAS and
+# several workers, point DEFAULT_CACHE_BACKEND at a backend they share, e.g. RedisCache.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DEFAULT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DEFAULT_CACHE_LOCATION', ''),
+    },
+    'history': {
+        'BACKEND': os.environ.get('HISTORY_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('HISTORY_CACHE_LOCATION', 'history'),
+    },
+}
+
+# Per-process cache of the users loaded by validate_token.
+USER_CACHE_ENABLED  = os.environ.get('USER_CACHE_ENABLED', 'False') == 'True'
+USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE', '10000'))
+USER_CACHE_TTL      = float(os.environ.get('USER_CACHE_TTL', '60'))
+
+# DATABASES aliases that serve read-only requests. After a write a user reads from default
+# for READ_YOUR_WRITES_SECONDS so the replicas have time to catch up.
+DATABASE_ROUTERS         = ['apps.util.routers.ReadReplicaRouter']
+READ_REPLICAS            = [alias for alias in os.environ.get('READ_REPLICAS', '').split(',') if alias]
+READ_YOUR_WRITES_SECONDS = float(os.environ.get('READ_YOUR_WRITES_SECONDS', '5'))
+
+# Request metrics. Workers share them through per-process files in METRICS_DIR when it is set.
+METRICS_DIR            = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1'))
+METRICS_ALLOWED_IPS    = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+
 CORS_ALLOW_CREDENTIALS = True
 
 CORS_ALLOW_METHODS = (   
@@ -0,0 +1,16 @@
+from .development import *
+
+# Throwaway database for the benchmark suite in benchmarks/, kept apart from db.sqlite3.
+DATABASES = {
+    'default': {
+        'ENGINE': 'apps.util.backends.sqlite3',
+        'NAME': os.environ.get('BENCHMARK_DATABASE_NAME', BASE_DIR / 'bench.sqlite3'),
+    }
+}
+
+DEBUG = False
+
+LOGGING = {
+    'disable_existing_loggers': False,
+    'version': 1,
+}
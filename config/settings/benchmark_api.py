@@ -0,0 +1,5 @@
+from .benchmark import *
+
+# benchmark with the stack of config.settings.api, to compare the two.
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in BROWSER_APPS]
+MIDDLEWARE     = [middleware for middleware in MIDDLEWARE if middleware not in BROWSER_MIDDLEWARE]
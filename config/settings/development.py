@@ -1,9 +1,16 @@
 from .base import *
 
+# replica stands in for a read replica locally, refreshed from db.sqlite3 with
+# python manage.py sync_replica. Set READ_REPLICAS=replica to route reads to it.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'apps.util.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'apps.util.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
     }
 }
 
@@ -26,6 +33,11 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        'apps.request': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
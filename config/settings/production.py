@@ -7,8 +7,35 @@ DATABASES = {
     }
 }
 
+if os.environ.get("PRODUCTION_REPLICA_DATABASE_NAME"):
+    DATABASES['replica'] = {
+        'ENGINE': os.environ.get("PRODUCTION_DATABASE_ENGINE"),
+        'NAME': os.environ.get("PRODUCTION_REPLICA_DATABASE_NAME"),
+    }
+
 DEBUG = False
 
+USER_CACHE_ENABLED    = os.environ.get('USER_CACHE_ENABLED', 'True') == 'True'
+HISTORY_CACHE_ENABLED = os.environ.get('HISTORY_CACHE_ENABLED', 'True') == 'True'
+
+LOGGING = {
+    'disable_existing_loggers': False,
+    'version': 1,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'level': 'INFO',
+        },
+    },
+    'loggers': {
+        'apps.request': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 ALLOWED_HOSTS = ['*']
 
 CORS_ORIGIN_ALLOW_ALL=True 
\ No newline at end of file
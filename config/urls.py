@@ -1,6 +1,9 @@
 from django.urls import path, include
 
+from apps.util.views import MetricsView
+
 urlpatterns = [
     path('auth', include('apps.auth.urls')),
-    path('accounts', include('apps.transaction.urls'))
+    path('accounts', include('apps.transaction.urls')),
+    path('internal/metrics', MetricsView.as_view())
 ]
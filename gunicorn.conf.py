@@ -0,0 +1,67 @@
+'''
+gunicorn profile for the WSGI app, picked up from the working directory.
+
+    gunicorn -c gunicorn.conf.py
+
+gthread workers serve GUNICORN_THREADS requests each, so one worker keeps serving while
+another thread waits on bcrypt or the database. The app is loaded and warmed once in the master,
+then gc.freeze() moves everything it allocated out of the collector's reach, so forked workers
+keep sharing those pages instead of copying them when a collection touches the objects.
+
+bcrypt is sized for the whole host here: the cores are split between the workers, and each worker
+lets fewer hashes wait than it has threads, so a worker flooded with signins or deposits answers
+the excess with 503 instead of parking every thread on bcrypt.
+
+With METRICS_DIR set, the files of an earlier run are cleared on start and an exited worker's
+file is folded into the aggregate, so metrics neither double count nor go backwards.
+'''
+import gc
+import os
+import multiprocessing
+
+bind         = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+wsgi_app     = 'config.wsgi:application'
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers      = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads      = int(os.environ.get('GUNICORN_THREADS', '4'))
+preload_app  = True
+
+def password_hasher_limits(cpu_count, workers, threads):
+    '''
+    (PASSWORD_HASHER_WORKERS, PASSWORD_HASHER_QUEUE_SIZE) for one of workers processes of threads threads.
+    '''
+    hasher_workers = max(1, cpu_count // workers)
+
+    return hasher_workers, max(0, threads - hasher_workers - 1)
+
+# Read by config.settings when the app is preloaded, unless set in the environment.
+password_hasher_workers, password_hasher_queue_size = password_hasher_limits(multiprocessing.cpu_count(), workers, threads)
+
+os.environ.setdefault('PASSWORD_HASHER_WORKERS', str(password_hasher_workers))
+os.environ.setdefault('PASSWORD_HASHER_QUEUE_SIZE', str(password_hasher_queue_size))
+
+def on_starting(server):
+    from apps.util.metrics import registry
+
+    registry.clear()
+
+def when_ready(server):
+    from django.core.management import call_command
+    from django.db              import connections
+
+    from apps.util.warmup import warm_up
+
+    # gunicorn skips Django's system checks; a misconfigured deploy, like read replicas behind a
+    # per-process cache, fails here instead of serving.
+    call_command('check')
+
+    warm_up()
+    connections.close_all()
+
+    gc.collect()
+    gc.freeze()
+
+def child_exit(server, worker):
+    from apps.util.metrics import registry
+
+    registry.fold(worker.pid)